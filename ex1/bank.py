@@ -1,16 +1,36 @@
 import secrets
 
-from .utils import BlockHash, PublicKey, GENESIS_BLOCK_PREV, verify
+from .utils import BlockHash, PublicKey, TxID, GENESIS_BLOCK_PREV, verify, verify_many
 from .transaction import Transaction
 from .block import Block
-from typing import List
+from .blockstore import BlockStore, MemoryBlockStore, StoredChain
+from .snapshot import UTXOSnapshot
+from .encoding import valid_sizes
+from .utxo import UTXOView
+from typing import Dict, List, Optional, Sequence, Set
 
 
 class Bank:
-    def __init__(self) -> None:
-        """Creates a bank with an empty blockchain and an empty mempool."""
+    def __init__(self, store: Optional[BlockStore] = None) -> None:
+        """Creates a bank with an empty blockchain and an empty mempool.
+        The blocks are kept in the given block store (in memory by default). If the store already holds a chain,
+        the bank continues from it."""
         self.mempool: List[Transaction] = list()
-        self.blockchain: List[Block] = list()
+        # the TxIDs spent by transactions in the mempool, used to detect double spends
+        self.mempool_inputs: Set[TxID] = set()
+        # unspent outputs of the committed blockchain, indexed by their TxID
+        self.utxo: Dict[TxID, Transaction] = dict()
+        # every committed block, the block hashes by height and the height of every block hash
+        self.store: BlockStore = store if store is not None else MemoryBlockStore()
+        self.block_hashes: List[BlockHash] = list()
+        self.heights: Dict[BlockHash, int] = dict()
+        self.blockchain: Sequence[Block] = StoredChain(self.block_hashes, self.store)
+        self.latest_hash: BlockHash = GENESIS_BLOCK_PREV
+        # the block the chain starts from and its height: the genesis (at height -1), or the block of a loaded utxo
+        # snapshot
+        self.base_hash: BlockHash = GENESIS_BLOCK_PREV
+        self.base_height: int = -1
+        self.restore_chain()
 
     def add_transaction_to_mempool(self, transaction: Transaction) -> bool:
         """
@@ -21,32 +41,54 @@ class Bank:
         (iii) there is contradicting tx in the mempool.
         (iv) there is no input (i.e., this is an attempt to create money from nothing)
         """
-        if not transaction.signature:
+        if not transaction.signature or not valid_sizes(transaction):
             return False
 
-        find_tx = False
-        utxos=self.get_utxo()
-        for i in range(len(utxos)):
-            if utxos[i].get_txid() == transaction.input:
-                find_tx = utxos[i]
-
-        if not find_tx:
+        find_tx = self.utxo.get(transaction.input)
+        if find_tx is None:
             return False
         if not verify(transaction.input + transaction.output, transaction.signature, find_tx.output):
             return False
 
-        if transaction.input not in [tx.get_txid() for tx in utxos]:
+        if transaction.input in self.mempool_inputs:
             return False
-
-        for tx in self.mempool:
-            if tx.input == transaction.input:
-                return False
         if not transaction.input:
             return False
 
         self.mempool.append(transaction)
+        self.mempool_inputs.add(transaction.input)
         return True
 
+    def add_transactions_to_mempool(self, transactions: List[Transaction],
+                                    max_workers: Optional[int] = None) -> List[bool]:
+        """
+        This function inserts a batch of transactions to the mempool.
+        The result of each transaction is the one add_transaction_to_mempool would return if the transactions
+        were added one after the other, in the given order.
+        The cheap checks (missing signature, unknown coin, conflict with the mempool) are done first, and the
+        signatures of the remaining transactions are verified in parallel over `max_workers` processes.
+        """
+        results = [False] * len(transactions)
+        candidates = list()
+        for i, transaction in enumerate(transactions):
+            if not transaction.signature or transaction.input in self.mempool_inputs or not valid_sizes(transaction):
+                continue
+            find_tx = self.utxo.get(transaction.input)
+            if find_tx is None:
+                continue
+            candidates.append((i, transaction, find_tx))
+
+        valid = verify_many([transaction.input + transaction.output for _, transaction, _ in candidates],
+                            [transaction.signature for _, transaction, _ in candidates],
+                            [find_tx.output for _, _, find_tx in candidates], max_workers)
+
+        for (i, transaction, _), is_valid in zip(candidates, valid):
+            if is_valid and transaction.input not in self.mempool_inputs:
+                self.mempool.append(transaction)
+                self.mempool_inputs.add(transaction.input)
+                results[i] = True
+        return results
+
     def end_day(self, limit: int = 10) -> BlockHash:
         """
         This function tells the bank that the day ended,
@@ -54,43 +96,90 @@ class Bank:
         If there are fewer than 'limit' transactions in the mempool, a smaller block is created.
         If there are no transactions, an empty block is created. The hash of the block is returned.
         """
-        if len(self.blockchain) == 0:
-            previous = GENESIS_BLOCK_PREV
-        else:
-            previous = self.get_latest_hash()
+        previous = self.get_latest_hash()
 
         if len(self.mempool) == 0:
             block = Block(list(), previous)
-            self.blockchain.append(block)
-            return block.get_block_hash()
         elif len(self.mempool)<limit:
             block = Block(self.mempool, previous)
             self.mempool = list()
-            self.blockchain.append(block)
-            return block.get_block_hash()
         else:
             block = Block(self.mempool[:limit], previous)
             self.mempool = self.mempool[limit:]
-            self.blockchain.append(block)
-            return block.get_block_hash()
+        block_hash = block.get_block_hash()
+        self.store.put(block_hash, block)
+        self.store.set_chain(len(self.block_hashes) - 1, [block_hash])
+        self.heights[block_hash] = self.base_height + 1 + len(self.block_hashes)
+        self.block_hashes.append(block_hash)
+        self.latest_hash = block_hash
+        self.update_utxo(block)
+        for transaction in block.get_transactions():
+            self.mempool_inputs.discard(transaction.input)
+        return block_hash
+
+    def restore_chain(self) -> None:
+        """
+        Rebuilds the blockchain indexes and the utxo index from the chain recorded in the block store.
+        Nothing is done if the recorded chain doesn't follow the latest block (a chain started from a utxo snapshot
+        is restored when the snapshot is loaded).
+        """
+        hashes = self.store.get_chain()
+        if not hashes or self.store.get(hashes[0]).get_prev_block_hash() != self.latest_hash:
+            return
+        for block_hash in hashes:
+            self.heights[block_hash] = self.base_height + 1 + len(self.block_hashes)
+            self.block_hashes.append(block_hash)
+            self.update_utxo(self.store.get(block_hash))
+        self.latest_hash = hashes[-1]
+
+    def update_utxo(self, block: Block) -> None:
+        """
+        Applies a newly committed block to the utxo index: the coins it spends are removed
+        and the coins it creates are added.
+        """
+        for transaction in block.get_transactions():
+            if transaction.input is not None:
+                self.utxo.pop(transaction.input, None)
+            self.utxo[transaction.get_txid()] = transaction
 
     def get_block(self, block_hash: BlockHash) -> Block:
         """
         This function returns a block object given its hash. If the block doesnt exist, an exception is thrown..
         """
-        for block in self.blockchain:
-            if block.get_block_hash() == block_hash:
-                return block
-        raise ValueError("the block isn't in the blockchain")
+        if block_hash not in self.heights:
+            raise ValueError("the block isn't in the blockchain")
+        return self.store.get(block_hash)
+
+    def get_block_height(self, block_hash: BlockHash) -> int:
+        """
+        This function returns the height of a block given its hash (the first block has height 0).
+        If the block doesnt exist, an exception is thrown.
+        """
+        if block_hash not in self.heights:
+            raise ValueError("the block isn't in the blockchain")
+        return self.heights[block_hash]
+
+    def get_block_by_height(self, height: int) -> Block:
+        """
+        This function returns the block at the given height. If there is no such block, an exception is thrown.
+        """
+        index = height - self.base_height - 1
+        if not 0 <= index < len(self.block_hashes):
+            raise ValueError("there is no block at this height")
+        return self.store.get(self.block_hashes[index])
 
     def get_latest_hash(self) -> BlockHash:
         """
         This function returns the hash of the last Block that was created by the bank.
         """
-        if len(self.blockchain) == 0:
-            return GENESIS_BLOCK_PREV
-        last_block = self.blockchain[len(self.blockchain) - 1]
-        return last_block.get_block_hash()
+        return self.latest_hash
+
+    def get_base_hash(self) -> BlockHash:
+        """
+        This function returns the hash of the block the blockchain starts from: GENESIS_BLOCK_PREV, or the block of
+        the utxo snapshot the bank was started from (the blocks up to it are not available).
+        """
+        return self.base_hash
 
     def get_mempool(self) -> List[Transaction]:
         """
@@ -101,21 +190,33 @@ class Bank:
     def get_utxo(self) -> List[Transaction]:
         """
         This function returns the list of unspent transactions.
+        The result is a read-only view of the utxo index that end_day keeps up to date: nothing is copied, and the
+        view follows later updates of the index.
         """
-        transactions = []
-        spent = set()
-        for block in self.blockchain:
-            for transaction in block.get_transactions():
-                transactions.append(transaction)
-
-                if transaction.input is not None:
-                    spent.add(transaction.input)
-
-        unspent = [tx for tx in transactions if tx.get_txid() not in spent]
-
-        return unspent
+        return UTXOView(self.utxo)
 
+    def export_utxo_snapshot(self) -> UTXOSnapshot:
+        """
+        This function returns a snapshot of the unspent transactions at the latest block.
+        """
+        return UTXOSnapshot(self.latest_hash, self.base_height + len(self.block_hashes), list(self.utxo.values()))
 
+    def load_utxo_snapshot(self, snapshot: UTXOSnapshot) -> None:
+        """
+        This function starts the bank from a snapshot of the unspent transactions instead of an empty blockchain.
+        The next block follows the snapshot block, and the blocks before it are not available.
+        Only a bank without blocks can load a snapshot, otherwise an exception is thrown.
+        If the block store holds a chain that follows the snapshot block, the bank continues from it.
+        """
+        if self.block_hashes:
+            raise ValueError("only a bank without blocks can load a snapshot")
+        # the index is updated in place, so that the views returned by get_utxo follow it
+        self.utxo.clear()
+        self.utxo.update((transaction.get_txid(), transaction) for transaction in snapshot.transactions)
+        self.latest_hash = snapshot.block_hash
+        self.base_hash = snapshot.block_hash
+        self.base_height = snapshot.height
+        self.restore_chain()
 
     def create_money(self, target: PublicKey) -> None:
         """
@@ -1,7 +1,8 @@
 import hashlib
 
-from .utils import BlockHash
+from .utils import BlockHash, TxID
 from .transaction import Transaction
+from .merkle import MerkleProof, merkle_proof, merkle_root
 from typing import List
 
 
@@ -13,10 +14,10 @@ class Block:
 
     def get_block_hash(self) -> BlockHash:
         """returns hash of this block"""
-        block_to_hash = self.previous_block
+        block_hash = hashlib.sha256(self.previous_block)
         for transaction in self.transactions_list:
-            block_to_hash += transaction.get_txid()
-        return BlockHash(hashlib.sha256(block_to_hash).digest())
+            block_hash.update(transaction.get_txid())
+        return BlockHash(block_hash.digest())
 
     def get_transactions(self) -> List[Transaction]:
         """returns the list of transactions in this block."""
@@ -25,3 +26,17 @@ class Block:
     def get_prev_block_hash(self) -> BlockHash:
         """Gets the hash of the previous block in the chain"""
         return self.previous_block
+
+    def get_merkle_root(self) -> bytes:
+        """Gets the root of the merkle tree of the txids of this block.
+        It commits to the transactions like the block hash does, but allows proving that one of them is in the block
+        with O(log(number of transactions)) hashes. The block hash itself doesn't depend on it."""
+        return merkle_root([transaction.get_txid() for transaction in self.transactions_list])
+
+    def get_inclusion_proof(self, txid: TxID) -> MerkleProof:
+        """Returns the proof that the transaction with the given txid is in this block, to be checked against
+        get_merkle_root() with merkle.verify_inclusion. Raises a ValueError if the transaction isn't in the block."""
+        txids = [transaction.get_txid() for transaction in self.transactions_list]
+        if txid not in txids:
+            raise ValueError("the transaction isn't in the block")
+        return merkle_proof(txids, txids.index(txid))
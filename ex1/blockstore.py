@@ -0,0 +1,282 @@
+"""
+Storage of the blocks known to a node, and of the order of the blocks of its current chain.
+
+MemoryBlockStore keeps the block objects in a dictionary. FileBlockStore appends the encoded blocks to segment files
+and only keeps an index from a block hash to its segment and offset in memory. Blocks are decoded from a memory map
+of their segment when they are requested, so they don't stay on the heap. The current chain is kept in a log of
+(height, hash) entries, so that a node reopening the store finds its chain again.
+"""
+import mmap
+import os
+import re
+import struct
+import zlib
+from abc import ABC, abstractmethod
+
+from .utils import BlockHash
+from .block import Block
+from .encoding import BLOCK_HEADER_SIZE, decode_block, encode_block
+from typing import Dict, Iterator, List, Sequence, Tuple, Union, overload
+
+# The size above which a new segment file is started.
+SEGMENT_SIZE = 16 * 1024 * 1024
+# The number of appended blocks after which the segment file is synced to the disk.
+SYNC_BLOCKS = 100
+
+# every stored block is preceded by its hash, the length of its encoding and a crc32 of the encoding
+_RECORD = struct.Struct(">32sII")
+# an entry of the chain log: a height, the hash of the block at this height and a crc32 of both
+_CHAIN_ENTRY = struct.Struct(">i32sI")
+_CHAIN_NAME = "chain.dat"
+_SEGMENT_NAME = "blocks{:05d}.dat"
+_SEGMENT_PATTERN = re.compile(r"blocks(\d{5})\.dat")
+
+
+class BlockStore(ABC):
+    """The operations of a block store. Blocks are only added, a stored block is never modified or removed."""
+
+    @abstractmethod
+    def put(self, block_hash: BlockHash, block: Block) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, block_hash: BlockHash) -> Block:
+        raise NotImplementedError
+
+    @abstractmethod
+    def __contains__(self, block_hash: object) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_chain(self, fork_height: int, hashes: List[BlockHash]) -> None:
+        """Records that the blocks of the current chain above fork_height were replaced by the given blocks."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_chain(self) -> List[BlockHash]:
+        """Returns the hashes of the blocks of the current chain, by height."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Makes sure the stored blocks survive a crash."""
+
+    def close(self) -> None:
+        self.flush()
+
+
+class MemoryBlockStore(BlockStore):
+    """Keeps the blocks in memory, indexed by their hash."""
+
+    def __init__(self) -> None:
+        self.blocks: Dict[BlockHash, Block] = dict()
+        self.chain: List[BlockHash] = list()
+
+    def put(self, block_hash: BlockHash, block: Block) -> None:
+        self.blocks[block_hash] = block
+
+    def get(self, block_hash: BlockHash) -> Block:
+        if block_hash not in self.blocks:
+            raise ValueError("the block isn't in the store")
+        return self.blocks[block_hash]
+
+    def __contains__(self, block_hash: object) -> bool:
+        return block_hash in self.blocks
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def set_chain(self, fork_height: int, hashes: List[BlockHash]) -> None:
+        del self.chain[fork_height + 1:]
+        self.chain.extend(hashes)
+
+    def get_chain(self) -> List[BlockHash]:
+        return list(self.chain)
+
+
+class FileBlockStore(BlockStore):
+    """
+    Appends the blocks to segment files in a directory. A segment is closed when it reaches segment_size bytes.
+    Appends are synced to the disk every sync_every blocks (and by flush() and close()), so a crash may lose the
+    last blocks, or leave a partly written block at the end of a segment. Opening the store scans the segments to
+    rebuild the index, and truncates them after the last complete block. The chain log is recovered the same way,
+    and the chain is cut before its first block that was lost.
+    """
+
+    def __init__(self, path: str, segment_size: int = SEGMENT_SIZE, sync_every: int = SYNC_BLOCKS) -> None:
+        self.path = path
+        self.segment_size = segment_size
+        self.sync_every = sync_every
+        self.index: Dict[BlockHash, Tuple[int, int]] = dict()
+        self.maps: Dict[int, mmap.mmap] = dict()
+        os.makedirs(path, exist_ok=True)
+        segments = sorted(int(match.group(1)) for match in map(_SEGMENT_PATTERN.fullmatch, os.listdir(path)) if match)
+        for number in segments:
+            self.recover_segment(number)
+        self.active: int = segments[-1] if segments else 0
+        self.file = open(self.segment_path(self.active), "ab")
+        self.active_size: int = self.file.tell()
+        self.chain: List[BlockHash] = self.recover_chain()
+        self.chain_file = open(os.path.join(path, _CHAIN_NAME), "ab")
+        self.chain_unsynced = False
+        # the number of appended blocks that are not synced yet, and whether some are still in the file buffer
+        self.unsynced = 0
+        self.buffered = False
+
+    def segment_path(self, number: int) -> str:
+        return os.path.join(self.path, _SEGMENT_NAME.format(number))
+
+    def recover_segment(self, number: int) -> None:
+        """Indexes the complete blocks of a segment and truncates whatever follows them."""
+        path = self.segment_path(number)
+        size = os.path.getsize(path)
+        offset = 0
+        if size:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                while offset + _RECORD.size <= size:
+                    block_hash, length, checksum = _RECORD.unpack_from(data, offset)
+                    end = offset + _RECORD.size + length
+                    # a tail of zeros would pass the checksum of an empty record, but no block is that short
+                    if length < BLOCK_HEADER_SIZE or end > size:
+                        break
+                    if zlib.crc32(data[offset + _RECORD.size:end]) != checksum:
+                        break
+                    self.index[BlockHash(block_hash)] = (number, offset)
+                    offset = end
+        if offset < size:
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+                os.fsync(f.fileno())
+
+    def recover_chain(self) -> List[BlockHash]:
+        """Replays the complete entries of the chain log and truncates whatever follows them."""
+        path = os.path.join(self.path, _CHAIN_NAME)
+        chain: List[BlockHash] = list()
+        if not os.path.exists(path):
+            return chain
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + _CHAIN_ENTRY.size <= len(data):
+            height, block_hash, checksum = _CHAIN_ENTRY.unpack_from(data, offset)
+            if zlib.crc32(data[offset:offset + _CHAIN_ENTRY.size - 4]) != checksum or not 0 <= height <= len(chain):
+                break
+            del chain[height:]
+            chain.append(BlockHash(block_hash))
+            offset += _CHAIN_ENTRY.size
+        if offset < len(data):
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+                os.fsync(f.fileno())
+        # the log may have been synced before the blocks it refers to
+        for height, block_hash in enumerate(chain):
+            if block_hash not in self.index:
+                del chain[height:]
+                break
+        return chain
+
+    def put(self, block_hash: BlockHash, block: Block) -> None:
+        if block_hash in self.index:
+            return
+        data = encode_block(block)
+        record = _RECORD.pack(block_hash, len(data), zlib.crc32(data)) + data
+        if self.active_size and self.active_size + len(record) > self.segment_size:
+            self.flush()
+            self.file.close()
+            if self.active in self.maps:
+                # the segment may have grown since it was mapped, it is mapped again when it is read
+                self.maps.pop(self.active).close()
+            self.active += 1
+            self.file = open(self.segment_path(self.active), "ab")
+            self.active_size = 0
+        self.file.write(record)
+        self.index[block_hash] = (self.active, self.active_size)
+        self.active_size += len(record)
+        self.buffered = True
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.flush()
+
+    def segment(self, number: int) -> mmap.mmap:
+        """Returns a memory map of a segment, remapping the active segment if it grew since it was mapped."""
+        data = self.maps.get(number)
+        if data is None or (number == self.active and len(data) < self.active_size):
+            if number == self.active and self.buffered:
+                self.file.flush()
+                self.buffered = False
+            if data is not None:
+                data.close()
+            with open(self.segment_path(number), "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[number] = data
+        return data
+
+    def get(self, block_hash: BlockHash) -> Block:
+        if block_hash not in self.index:
+            raise ValueError("the block isn't in the store")
+        number, offset = self.index[block_hash]
+        return decode_block(self.segment(number), offset + _RECORD.size)
+
+    def __contains__(self, block_hash: object) -> bool:
+        return block_hash in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def set_chain(self, fork_height: int, hashes: List[BlockHash]) -> None:
+        del self.chain[fork_height + 1:]
+        for block_hash in hashes:
+            entry = struct.pack(">i32s", len(self.chain), block_hash)
+            self.chain_file.write(entry + struct.pack(">I", zlib.crc32(entry)))
+            self.chain.append(block_hash)
+        self.chain_unsynced = True
+
+    def get_chain(self) -> List[BlockHash]:
+        return list(self.chain)
+
+    def flush(self) -> None:
+        if self.unsynced or self.buffered:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+            self.buffered = False
+        if self.chain_unsynced:
+            self.chain_file.flush()
+            os.fsync(self.chain_file.fileno())
+            self.chain_unsynced = False
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+        self.chain_file.close()
+        for data in self.maps.values():
+            data.close()
+        self.maps = dict()
+
+
+class StoredChain(Sequence[Block]):
+    """A read-only list-like view of a chain, given the hashes of its blocks. The blocks are read from the store."""
+
+    def __init__(self, hashes: List[BlockHash], store: BlockStore) -> None:
+        self.hashes = hashes
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def __iter__(self) -> Iterator[Block]:
+        return (self.store.get(block_hash) for block_hash in list(self.hashes))
+
+    @overload
+    def __getitem__(self, index: int) -> Block: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[Block]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Block, Sequence[Block]]:
+        if isinstance(index, slice):
+            return [self.store.get(block_hash) for block_hash in self.hashes[index]]
+        return self.store.get(self.hashes[index])
@@ -0,0 +1,158 @@
+"""
+A compact binary format for transactions and blocks.
+
+Every transaction takes TX_SIZE bytes: a flags byte, the 32 bytes output, the 32 bytes input (zeros if there is none)
+and the 64 bytes signature (a 48 bytes money creation nonce is padded with zeros).
+A block is a BLOCK_HEADER_SIZE bytes header (format version, length of the previous hash, the previous hash padded
+to 32 bytes and the number of transactions) followed by its transactions.
+Since all the sizes are known from the header, a buffer holding many blocks can be walked without parsing the
+transactions, and the views below read the fields straight from the buffer.
+"""
+import hashlib
+import struct
+
+from .utils import BlockHash, PublicKey, Signature, TxID
+from .block import Block
+from .transaction import Transaction
+from typing import Iterator, List, Union
+
+FORMAT_VERSION = 1
+
+KEY_SIZE = 32
+SIGNATURE_SIZE = 64
+NONCE_SIZE = 48
+TX_SIZE = 1 + KEY_SIZE + KEY_SIZE + SIGNATURE_SIZE
+
+# the flags of a transaction
+HAS_INPUT = 0x01
+HAS_NONCE = 0x02
+
+_HEADER = struct.Struct(">BB32sI")
+BLOCK_HEADER_SIZE = _HEADER.size
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def valid_sizes(transaction: Transaction) -> bool:
+    """Returns True if the fields of the transaction have the sizes of the encoding: a 32 bytes output, and either
+    a 32 bytes input with a 64 bytes signature, or no input with a 48 bytes money creation nonce."""
+    if len(transaction.output or b"") != KEY_SIZE:
+        return False
+    if transaction.input is None:
+        return len(transaction.signature or b"") == NONCE_SIZE
+    return len(transaction.input) == KEY_SIZE and len(transaction.signature or b"") == SIGNATURE_SIZE
+
+
+def encode_transaction(transaction: Transaction) -> bytes:
+    """Returns the TX_SIZE bytes encoding of the transaction. Raises a ValueError if a field has an invalid size."""
+    if len(transaction.output) != KEY_SIZE:
+        raise ValueError("the output must be a {} bytes public key".format(KEY_SIZE))
+    if transaction.input is not None and len(transaction.input) != KEY_SIZE:
+        raise ValueError("the input must be a {} bytes txid".format(KEY_SIZE))
+    signature = transaction.signature or b""
+    if len(signature) not in (SIGNATURE_SIZE, NONCE_SIZE):
+        raise ValueError("the signature must be a {} bytes signature or a {} bytes nonce".format(
+            SIGNATURE_SIZE, NONCE_SIZE))
+    flags = (HAS_INPUT if transaction.input is not None else 0) | (HAS_NONCE if len(signature) == NONCE_SIZE else 0)
+    return b"".join([bytes([flags]), transaction.output, transaction.input or bytes(KEY_SIZE),
+                     signature.ljust(SIGNATURE_SIZE, b"\0")])
+
+
+def encode_block(block: Block) -> bytes:
+    """Returns the encoding of the block: its header followed by its transactions."""
+    previous = block.get_prev_block_hash()
+    if len(previous) > KEY_SIZE:
+        raise ValueError("the previous block hash is longer than {} bytes".format(KEY_SIZE))
+    header = _HEADER.pack(FORMAT_VERSION, len(previous), previous, len(block.get_transactions()))
+    return b"".join([header] + [encode_transaction(transaction) for transaction in block.get_transactions()])
+
+
+class TransactionView:
+    """A transaction encoded in a buffer. The buffer isn't copied, fields are read from it when they are accessed."""
+
+    def __init__(self, buffer: Buffer, offset: int = 0) -> None:
+        self.data: memoryview = memoryview(buffer)[offset:offset + TX_SIZE]
+        if len(self.data) != TX_SIZE:
+            raise ValueError("the buffer is too short for a transaction")
+        self.flags: int = self.data[0]
+        if self.flags & ~(HAS_INPUT | HAS_NONCE):
+            raise ValueError("unknown transaction flags")
+        self.signature_size: int = NONCE_SIZE if self.flags & HAS_NONCE else SIGNATURE_SIZE
+
+    def _fields(self) -> List[memoryview]:
+        fields = [self.data[1:1 + KEY_SIZE]]
+        if self.flags & HAS_INPUT:
+            fields.append(self.data[1 + KEY_SIZE:1 + 2 * KEY_SIZE])
+        fields.append(self.data[1 + 2 * KEY_SIZE:1 + 2 * KEY_SIZE + self.signature_size])
+        return fields
+
+    def get_txid(self) -> TxID:
+        """Computes the txid of the transaction directly from the buffer (same as Transaction.get_txid)."""
+        txid = hashlib.sha256()
+        for field in self._fields():
+            txid.update(field)
+        return TxID(txid.digest())
+
+    def to_transaction(self) -> Transaction:
+        output = PublicKey(self.data[1:1 + KEY_SIZE].tobytes())
+        tx_input = TxID(self.data[1 + KEY_SIZE:1 + 2 * KEY_SIZE].tobytes()) if self.flags & HAS_INPUT else None
+        signature = Signature(self.data[1 + 2 * KEY_SIZE:1 + 2 * KEY_SIZE + self.signature_size].tobytes())
+        return Transaction(output, tx_input, signature)
+
+
+class BlockView:
+    """A block encoded in a buffer. Only the header is read when the view is created, the transactions are
+    decoded when they are accessed."""
+
+    def __init__(self, buffer: Buffer, offset: int = 0) -> None:
+        data = memoryview(buffer)
+        if len(data) - offset < BLOCK_HEADER_SIZE:
+            raise ValueError("the buffer is too short for a block header")
+        version, previous_size, previous, self.tx_count = _HEADER.unpack_from(data, offset)
+        if version != FORMAT_VERSION:
+            raise ValueError("unsupported block format version {}".format(version))
+        if previous_size > KEY_SIZE:
+            raise ValueError("invalid previous block hash length")
+        self.previous_block: BlockHash = BlockHash(previous[:previous_size])
+        self.size: int = BLOCK_HEADER_SIZE + self.tx_count * TX_SIZE
+        self.data: memoryview = data[offset:offset + self.size]
+        if len(self.data) != self.size:
+            raise ValueError("the buffer is too short for the block")
+
+    def get_prev_block_hash(self) -> BlockHash:
+        return self.previous_block
+
+    def get_transaction(self, index: int) -> TransactionView:
+        if not 0 <= index < self.tx_count:
+            raise IndexError("transaction index out of range")
+        return TransactionView(self.data, BLOCK_HEADER_SIZE + index * TX_SIZE)
+
+    def get_block_hash(self) -> BlockHash:
+        """Computes the hash of the block directly from the buffer (same as Block.get_block_hash)."""
+        block_hash = hashlib.sha256(self.previous_block)
+        for index in range(self.tx_count):
+            block_hash.update(self.get_transaction(index).get_txid())
+        return BlockHash(block_hash.digest())
+
+    def to_block(self) -> Block:
+        return Block([self.get_transaction(index).to_transaction() for index in range(self.tx_count)],
+                     self.previous_block)
+
+
+def decode_transaction(buffer: Buffer, offset: int = 0) -> Transaction:
+    return TransactionView(buffer, offset).to_transaction()
+
+
+def decode_block(buffer: Buffer, offset: int = 0) -> Block:
+    return BlockView(buffer, offset).to_block()
+
+
+def iter_blocks(buffer: Buffer) -> Iterator[BlockView]:
+    """Walks over consecutive encoded blocks in the buffer, yielding a view of each one.
+    Only the headers are read, so skipping over thousands of blocks doesn't decode their transactions."""
+    data = memoryview(buffer)
+    offset = 0
+    while offset < len(data):
+        view = BlockView(data, offset)
+        offset += view.size
+        yield view
@@ -0,0 +1,70 @@
+"""
+Snapshots of the utxo set.
+
+A snapshot holds the unspent outputs at a given block, so that a node can start from it instead of replaying the
+chain. Its encoding is a header (magic, format version, height, length of the block hash, the block hash padded to
+32 bytes and the number of outputs), the outputs in the fixed-width transaction encoding, and a sha256 checksum of
+everything before it.
+"""
+import hashlib
+import os
+import struct
+
+from .utils import BlockHash
+from .transaction import Transaction
+from .encoding import KEY_SIZE, TX_SIZE, Buffer, TransactionView, encode_transaction
+from typing import List
+
+MAGIC = b"UTXO"
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct(">4sBiB32sI")
+CHECKSUM_SIZE = 32
+
+
+class UTXOSnapshot:
+    """The unspent outputs after the block block_hash, at the given height (-1 for the empty chain)."""
+
+    def __init__(self, block_hash: BlockHash, height: int, transactions: List[Transaction]) -> None:
+        self.block_hash: BlockHash = block_hash
+        self.height: int = height
+        self.transactions: List[Transaction] = transactions
+
+    def to_bytes(self) -> bytes:
+        if len(self.block_hash) > KEY_SIZE:
+            raise ValueError("the block hash is longer than {} bytes".format(KEY_SIZE))
+        data = b"".join([_HEADER.pack(MAGIC, SNAPSHOT_VERSION, self.height, len(self.block_hash), self.block_hash,
+                                      len(self.transactions))]
+                        + [encode_transaction(transaction) for transaction in self.transactions])
+        return data + hashlib.sha256(data).digest()
+
+    @staticmethod
+    def from_bytes(buffer: Buffer) -> 'UTXOSnapshot':
+        """Decodes a snapshot. Raises a ValueError if it is truncated, corrupted or of an unknown version."""
+        data = memoryview(buffer)
+        if len(data) < _HEADER.size + CHECKSUM_SIZE:
+            raise ValueError("the snapshot is truncated")
+        magic, version, height, hash_size, block_hash, count = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError("not a utxo snapshot of version {}".format(SNAPSHOT_VERSION))
+        if hash_size > KEY_SIZE or len(data) != _HEADER.size + count * TX_SIZE + CHECKSUM_SIZE:
+            raise ValueError("the snapshot is truncated")
+        if hashlib.sha256(data[:-CHECKSUM_SIZE]).digest() != data[-CHECKSUM_SIZE:]:
+            raise ValueError("the snapshot checksum doesn't match its content")
+        transactions = [TransactionView(data, _HEADER.size + index * TX_SIZE).to_transaction()
+                        for index in range(count)]
+        return UTXOSnapshot(BlockHash(block_hash[:hash_size]), height, transactions)
+
+    def save(self, path: str) -> None:
+        """Writes the snapshot to a file. The file is replaced at once, so a crash never leaves half a snapshot."""
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(self.to_bytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+    @staticmethod
+    def load(path: str) -> 'UTXOSnapshot':
+        with open(path, "rb") as f:
+            return UTXOSnapshot.from_bytes(f.read())
@@ -0,0 +1,50 @@
+import secrets
+from typing import List, Tuple
+
+from .bank import Bank
+from .transaction import Transaction
+from .utils import PARALLEL_VERIFY_THRESHOLD, PrivateKey, PublicKey, Signature, TxID, gen_keys, sign
+
+
+def payment(coin: TxID, target: PublicKey, private_key: PrivateKey) -> Transaction:
+    return Transaction(target, coin, sign(coin + target, private_key))
+
+
+def funded_bank(owners: int) -> Tuple[Bank, List[Tuple[TxID, PrivateKey]]]:
+    """A bank in which each of the given number of new key pairs owns one coin."""
+    bank = Bank()
+    keys = [gen_keys() for _ in range(owners)]
+    for _, public_key in keys:
+        bank.create_money(public_key)
+    bank.end_day(limit=owners)
+    coins = {transaction.output: transaction.get_txid() for transaction in bank.get_utxo()}
+    return bank, [(coins[public_key], private_key) for private_key, public_key in keys]
+
+
+def test_batch_admission_matches_one_by_one_admission() -> None:
+    bank, coins = funded_bank(PARALLEL_VERIFY_THRESHOLD + 10)
+    # the same coins in a second bank, with the same transaction already in both mempools
+    other = Bank()
+    other.load_utxo_snapshot(bank.export_utxo_snapshot())
+    _, target = gen_keys()
+    in_mempool = payment(coins[0][0], target, coins[0][1])
+    assert bank.add_transaction_to_mempool(in_mempool)
+    assert other.add_transaction_to_mempool(in_mempool)
+
+    # bad signatures that come before valid spends of the same coins
+    batch = [Transaction(gen_keys()[1], coins[3][0], Signature(secrets.token_bytes(64))),
+             payment(coins[4][0], target, gen_keys()[0]),
+             Transaction(target, coins[5][0], Signature(b""))]
+    batch.extend(payment(coin, target, private_key) for coin, private_key in coins[1:])
+    batch.append(batch[3])  # a duplicate
+    batch.append(payment(coins[1][0], gen_keys()[1], coins[1][1]))  # a double spend of an accepted coin
+    batch.append(payment(coins[0][0], gen_keys()[1], coins[0][1]))  # a conflict with the mempool
+    batch.append(Transaction(target, TxID(secrets.token_bytes(32)), Signature(secrets.token_bytes(64))))
+    batch.append(payment(TxID(secrets.token_bytes(32)), target, coins[2][1]))  # an unknown coin
+    assert len(batch) > PARALLEL_VERIFY_THRESHOLD
+
+    one_by_one = [bank.add_transaction_to_mempool(transaction) for transaction in batch]
+    assert other.add_transactions_to_mempool(batch, max_workers=2) == one_by_one
+    assert True in one_by_one and False in one_by_one
+    assert ([transaction.get_txid() for transaction in other.get_mempool()]
+            == [transaction.get_txid() for transaction in bank.get_mempool()])
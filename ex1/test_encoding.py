@@ -0,0 +1,24 @@
+from .bank import Bank
+from .encoding import decode_block, encode_block, iter_blocks
+from .wallet import Wallet
+
+
+def test_round_trip_of_the_blocks_of_a_bank() -> None:
+    bank, alice, bob = Bank(), Wallet(), Wallet()
+    bank.create_money(alice.get_address())
+    bank.end_day()
+    alice.update(bank)
+    transaction = alice.create_transaction(bob.get_address())
+    assert transaction is not None and bank.add_transaction_to_mempool(transaction)
+    bank.end_day()
+    bank.end_day()
+
+    blocks = list(bank.blockchain)
+    for block in blocks:
+        decoded = decode_block(encode_block(block))
+        assert decoded.get_prev_block_hash() == block.get_prev_block_hash()
+        assert decoded.get_block_hash() == block.get_block_hash()
+        assert ([(tx.output, tx.input, tx.signature) for tx in decoded.get_transactions()]
+                == [(tx.output, tx.input, tx.signature) for tx in block.get_transactions()])
+    views = list(iter_blocks(b"".join(encode_block(block) for block in blocks)))
+    assert [view.get_block_hash() for view in views] == [block.get_block_hash() for block in blocks]
@@ -1,6 +1,10 @@
 from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat, PrivateFormat, NoEncryption
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
-from typing import NewType, Tuple
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Dict, List, NewType, Optional, Sequence, Tuple
 
 # The following types are used to distinguish between bytes that are used as private keys, public keys and signature.
 # This utilizes typechecking to ensure we won't be using them interchangeably.
@@ -12,23 +16,45 @@ Signature = NewType('Signature', bytes)
 BlockHash = NewType('BlockHash', bytes)  # This will be the hash of a block
 TxID = NewType("TxID", bytes)  # this will be a hash of a transaction
 
+# batches smaller than this are verified in the calling process, a process pool isn't worth starting for them.
+PARALLEL_VERIFY_THRESHOLD = 64
+
 # these are the bytes written as the prev_block_hash of the 1st block.
 # (when a new wallet is created, it is updated up to this point)
 GENESIS_BLOCK_PREV = BlockHash(b"Genesis")
 
+# The number of parsed key objects kept by the key caches (least recently used keys are dropped first).
+KEY_CACHE_SIZE = 1024
+
+# the process pools of verify_many by number of workers, started on first use and reused by later batches.
+_VERIFY_POOLS: Dict[int, ProcessPoolExecutor] = dict()
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def _load_private_key(private_key: PrivateKey) -> Ed25519PrivateKey:
+    return Ed25519PrivateKey.from_private_bytes(private_key)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def _load_public_key(pub_key: PublicKey) -> Ed25519PublicKey:
+    return Ed25519PublicKey.from_public_bytes(pub_key)
+
+
+def key_cache_info() -> Dict[str, Tuple[int, int, int, int]]:
+    """Returns the (hits, misses, maxsize, currsize) statistics of the private and public key caches"""
+    return {"private": _load_private_key.cache_info(), "public": _load_public_key.cache_info()}
+
 
 def sign(message: bytes, private_key: PrivateKey) -> Signature:
     """Signs the given message using the given private key"""
-    pk = Ed25519PrivateKey.from_private_bytes(
-        private_key)
+    pk = _load_private_key(private_key)
     return Signature(pk.sign(message))
 
 
 def verify(message: bytes, sig: Signature, pub_key: PublicKey) -> bool:
     """Verifies a signature for a given message using a public key. 
     Returns True is the signature matches, otherwise False"""
-    pub_k = Ed25519PublicKey.from_public_bytes(
-        pub_key)
+    pub_k = _load_public_key(pub_key)
     try:
         pub_k.verify(sig, message)
         return True
@@ -36,6 +62,25 @@ def verify(message: bytes, sig: Signature, pub_key: PublicKey) -> bool:
         return False
 
 
+def verify_many(messages: Sequence[bytes], sigs: Sequence[Signature], pub_keys: Sequence[PublicKey],
+                max_workers: Optional[int] = None) -> List[bool]:
+    """Verifies a batch of signatures, the i-th signature is checked against the i-th message and public key.
+    Large batches are spread over a pool of processes (unless there is a single worker), which is kept for the
+    next batches. Returns the results in the order of the inputs"""
+    workers = max_workers or os.cpu_count() or 1
+    if len(messages) < PARALLEL_VERIFY_THRESHOLD or workers == 1:
+        return list(map(verify, messages, sigs, pub_keys))
+    if workers not in _VERIFY_POOLS:
+        _VERIFY_POOLS[workers] = ProcessPoolExecutor(workers)
+    chunksize = max(1, len(messages) // (workers * 4))
+    try:
+        return list(_VERIFY_POOLS[workers].map(verify, messages, sigs, pub_keys, chunksize=chunksize))
+    except BrokenProcessPool:
+        # a worker died, the pool is started again by the next batch
+        del _VERIFY_POOLS[workers]
+        return list(map(verify, messages, sigs, pub_keys))
+
+
 def gen_keys() -> Tuple[PrivateKey, PublicKey]:
     """generates a private key and a corresponding public key. 
     The keys are returned in byte format to allow them to be serialized easily."""
@@ -0,0 +1,47 @@
+from itertools import islice
+
+from .utils import TxID
+from .transaction import Transaction
+from typing import Dict, Iterator, Sequence, Union, overload
+
+
+class UTXOView(Sequence[Transaction]):
+    """A read-only list-like view of the transactions of a utxo index, that doesn't copy them.
+    The view follows the later changes of the index."""
+
+    def __init__(self, utxo: Dict[TxID, Transaction]) -> None:
+        self.utxo = utxo
+
+    def __len__(self) -> int:
+        return len(self.utxo)
+
+    def __iter__(self) -> Iterator[Transaction]:
+        return iter(self.utxo.values())
+
+    def __contains__(self, transaction: object) -> bool:
+        if not isinstance(transaction, Transaction):
+            return False
+        return self.utxo.get(transaction.get_txid()) is transaction
+
+    @overload
+    def __getitem__(self, index: int) -> Transaction: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[Transaction]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Transaction, Sequence[Transaction]]:
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("utxo index out of range")
+        return next(islice(self.utxo.values(), index, None))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (list, tuple, UTXOView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
@@ -24,6 +24,11 @@ class Wallet:
         end = bank.get_latest_hash()
         curr = self.last_hash
         while end != curr:
+            if end == bank.get_base_hash():
+                # the bank started from a utxo snapshot taken after the last update, and the blocks up to it
+                # are not available: the coins of this wallet are read from the bank's utxo instead
+                self.utxo = {tx.get_txid(): tx for tx in bank.get_utxo() if tx.output == self.public_key}
+                break
             last_block = bank.get_block(end)
             for tx in last_block.get_transactions():
                 if tx.input in self.utxo:
@@ -1,10 +1,17 @@
 # the following lines expose items defined in various files when using 'from ex2 import <item>'
 from .block import Block
 from .transaction import Transaction
+from .merkle import verify_inclusion
+from .encoding import encode_block, decode_block, iter_blocks
+from .blockstore import BlockStore, MemoryBlockStore, FileBlockStore
+from .snapshot import UTXOSnapshot
 from .node import Node
-from .utils import PublicKey, Signature, BlockHash, TxID, GENESIS_BLOCK_PREV, BLOCK_SIZE, sign, gen_keys, verify
+from .network import MessageBus
+from .utils import PublicKey, Signature, BlockHash, TxID, GENESIS_BLOCK_PREV, BLOCK_SIZE, sign, gen_keys, verify, verify_many
 
 
 # this defines what to import when using 'from ex2 import *'
-__all__ = ["Node", "Block", "Transaction", "PublicKey",
-           "Signature", "BlockHash", "TxID", "GENESIS_BLOCK_PREV", "BLOCK_SIZE", "sign", "gen_keys", "verify"]
+__all__ = ["Node", "MessageBus", "Block", "Transaction", "PublicKey",
+           "Signature", "BlockHash", "TxID", "GENESIS_BLOCK_PREV", "BLOCK_SIZE", "sign", "gen_keys", "verify",
+           "verify_many", "verify_inclusion", "encode_block", "decode_block", "iter_blocks",
+           "BlockStore", "MemoryBlockStore", "FileBlockStore", "UTXOSnapshot"]
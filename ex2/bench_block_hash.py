@@ -0,0 +1,58 @@
+"""
+Compares Block.get_block_hash, which feeds the txids to a single sha256 object, with hashing a preimage built by
+concatenating bytes in a loop (how blocks used to be hashed). Reports the time per hash and the peak memory
+allocated while hashing, for a full block and for oversized ones.
+
+Usage: python -m ex2.bench_block_hash [--repeat 2000] [--sizes 10 100 1000]
+"""
+import argparse
+import hashlib
+import secrets
+import timeit
+import tracemalloc
+
+from .block import Block
+from .transaction import Transaction
+from .utils import BLOCK_SIZE, BlockHash, GENESIS_BLOCK_PREV
+from typing import Callable, List, Optional
+
+
+def concatenated_block_hash(block: Block) -> BlockHash:
+    block_to_hash = block.get_prev_block_hash()
+    for transaction in block.get_transactions():
+        block_to_hash += transaction.get_txid()
+    return BlockHash(hashlib.sha256(block_to_hash).digest())
+
+
+def peak_allocation(function: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks block hashing.")
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[BLOCK_SIZE, 100, 1000, 10000])
+    args = parser.parse_args(argv)
+
+    print("{:>8} {:>14} {:>14} {:>14} {:>14}".format(
+        "txs", "concat us", "streaming us", "concat bytes", "stream bytes"))
+    for size in args.sizes:
+        block = Block(GENESIS_BLOCK_PREV,
+                      [Transaction(secrets.token_bytes(32), secrets.token_bytes(32), secrets.token_bytes(64))
+                       for _ in range(size)])
+        assert block.get_block_hash() == concatenated_block_hash(block)
+        repeat = max(1, args.repeat * BLOCK_SIZE // size)
+        concat_time = timeit.timeit(lambda: concatenated_block_hash(block), number=repeat) / repeat
+        stream_time = timeit.timeit(block.get_block_hash, number=repeat) / repeat
+        print("{:>8} {:>14.2f} {:>14.2f} {:>14} {:>14}".format(
+            size, concat_time * 1e6, stream_time * 1e6,
+            peak_allocation(lambda: concatenated_block_hash(block)), peak_allocation(block.get_block_hash)))
+
+
+if __name__ == "__main__":
+    main()
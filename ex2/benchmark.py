@@ -0,0 +1,190 @@
+"""
+Benchmarks a simulated network of nodes: builds a topology, runs rounds of transactions and mining,
+and reports throughput, block propagation times and resource usage as JSON.
+
+Usage: python -m ex2.benchmark --topology scale-free --nodes 200 --blocks 20 --txs-per-block 9 --output run.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from .node import Node
+from .network import MessageBus
+from .sigcache import SignatureCache
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None  # type: ignore
+
+Edges = Set[Tuple[int, int]]
+
+
+def peak_memory_kb() -> Optional[int]:
+    """The peak resident set size of this process, in KB (None where it can't be measured).
+    ru_maxrss is in KB on Linux, but in bytes on macOS."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def ring(n: int, rng: random.Random) -> Edges:
+    """Each node is connected to the next one, and the last one to the first."""
+    return {(i, (i + 1) % n) for i in range(n)} if n > 1 else set()
+
+
+def random_regular(n: int, degree: int, rng: random.Random, attempts: int = 100) -> Edges:
+    """A random graph in which every node has the given degree (n * degree must be even)."""
+    if degree >= n or (n * degree) % 2:
+        raise ValueError("there is no {}-regular graph with {} nodes".format(degree, n))
+    for _ in range(attempts):
+        stubs = [node for node in range(n) for _ in range(degree)]
+        rng.shuffle(stubs)
+        edges = set()
+        for a, b in zip(stubs[::2], stubs[1::2]):
+            edge = (min(a, b), max(a, b))
+            if a == b or edge in edges:
+                break
+            edges.add(edge)
+        else:
+            return edges
+    raise ValueError("failed to build a random regular graph, try another seed")
+
+
+def scale_free(n: int, m: int, rng: random.Random) -> Edges:
+    """A Barabasi-Albert graph: every new node connects to m existing nodes, chosen proportionally to their degree."""
+    edges: Edges = set()
+    targets = list(range(min(m, n)))
+    endpoints: List[int] = list()
+    for node in range(len(targets), n):
+        for target in set(targets):
+            edges.add((target, node))
+            endpoints.extend((target, node))
+        targets = [rng.choice(endpoints) for _ in range(m)]
+    return edges
+
+
+TOPOLOGIES = {
+    "ring": lambda args, rng: ring(args.nodes, rng),
+    "random-regular": lambda args, rng: random_regular(args.nodes, args.degree, rng),
+    "scale-free": lambda args, rng: scale_free(args.nodes, args.degree, rng),
+}
+
+
+def build_network(n: int, edges: Edges, bus: MessageBus) -> List[Node]:
+    """Creates the nodes and connects them. Every node gets its own signature cache, as it would have in its own
+    process, so that the verifications of all the nodes are counted."""
+    nodes = [Node() for _ in range(n)]
+    for node in nodes:
+        node.bus = bus
+        node.signature_cache = SignatureCache()
+    for a, b in sorted(edges):
+        nodes[a].connect(nodes[b])
+    bus.run()
+    return nodes
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    return sorted(values)[max(0, int(round(fraction * len(values))) - 1)]
+
+
+def propagate_block(nodes: List[Node], miner: Node, bus: MessageBus) -> Tuple[List[float], int]:
+    """Mines a block at the miner and delivers messages until the network is quiet.
+    Returns the times (since mining started) at which each node adopted the block, and the number of messages."""
+    start = time.perf_counter()
+    block_hash = miner.mine_block()
+    reached = {miner: time.perf_counter() - start}
+    messages = 0
+    while bus.queue:
+        receiver = bus.queue[0][0]
+        bus.step()
+        messages += 1
+        if receiver not in reached and receiver.get_latest_hash() == block_hash:
+            reached[receiver] = time.perf_counter() - start
+    return list(reached.values()), messages
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    bus = MessageBus(auto_run=False)
+    edges = TOPOLOGIES[args.topology](args, rng)
+    setup_start = time.perf_counter()
+    nodes = build_network(args.nodes, edges, bus)
+    setup_time = time.perf_counter() - setup_start
+
+    for node in nodes:
+        node.signature_cache.hits = node.signature_cache.misses = 0
+    tx_time = block_time = 0.0
+    txs = blocks = block_messages = tx_messages = 0
+    propagation: Dict[str, List[float]] = {"p50": [], "p90": [], "p100": []}
+    for _ in range(args.blocks):
+        start = time.perf_counter()
+        senders = [node for node in nodes if node.get_balance() > 0]
+        for _ in range(args.txs_per_block if senders else 0):
+            sender = rng.choice(senders)
+            if sender.create_transaction(rng.choice(nodes).get_address()) is not None:
+                txs += 1
+            tx_messages += bus.run()
+        tx_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        times, messages = propagate_block(nodes, rng.choice(nodes), bus)
+        block_time += time.perf_counter() - start
+        blocks += 1
+        block_messages += messages
+        for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p100", 1.0)):
+            # a block that didn't reach the fraction of the network (a tie or a lost race) is not counted
+            if len(times) >= fraction * len(nodes):
+                propagation[name].append(sorted(times)[max(0, int(round(fraction * len(nodes))) - 1)])
+
+    return {
+        "config": vars(args),
+        "edges": len(edges),
+        "setup_seconds": setup_time,
+        "blocks": blocks,
+        "transactions": txs,
+        "blocks_per_second": blocks / block_time if block_time else None,
+        "txs_per_second": txs / tx_time if tx_time else None,
+        "propagation_seconds": {name: {"median": percentile(values, 0.5), "max": max(values, default=None)}
+                                for name, values in propagation.items()},
+        "messages_per_block": block_messages / blocks if blocks else None,
+        "messages_per_tx": tx_messages / txs if txs else None,
+        "messages_delivered": dict(bus.delivered),
+        "signature_verifications": sum(node.signature_cache.misses for node in nodes),
+        "signature_verifications_per_node": (sum(node.signature_cache.misses for node in nodes) / len(nodes)
+                                             if nodes else None),
+        "signature_cache_hits": sum(node.signature_cache.hits for node in nodes),
+        "peak_memory_kb": peak_memory_kb(),
+        "final_chain_length": max(len(node.blockchain) for node in nodes),
+        "nodes_on_best_tip": sum(node.get_latest_hash() == nodes[0].get_latest_hash() for node in nodes),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks block and transaction propagation between nodes.")
+    parser.add_argument("--topology", choices=sorted(TOPOLOGIES), default="random-regular")
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--degree", type=int, default=4,
+                        help="the degree of a random-regular graph, or the edges added per node in a scale-free one")
+    parser.add_argument("--blocks", type=int, default=20)
+    parser.add_argument("--txs-per-block", type=int, default=9)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="a file to write the JSON report to (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
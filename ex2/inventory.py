@@ -0,0 +1,35 @@
+from collections import OrderedDict
+
+from typing import Generic, Hashable, Optional, TypeVar
+
+V = TypeVar('V')
+
+
+class InventoryFilter(Generic[V]):
+    """A bounded map of recently seen hashes (and optionally an object for each of them).
+    When it is full, the hash that was added first is forgotten."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size: int = max_size
+        self.entries: 'OrderedDict[Hashable, Optional[V]]' = OrderedDict()
+
+    def add(self, key: Hashable, value: Optional[V] = None) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        return self.entries.get(key)
+
+    def discard(self, key: Hashable) -> None:
+        self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,53 @@
+from itertools import islice
+
+from .utils import TxID
+from .transaction import Transaction
+from typing import Dict, Iterator, List, Optional
+
+
+class Mempool:
+    """The transactions waiting to enter a block, in the order they were added.
+    They are indexed by their txid and by the txid of the output they spend, so conflicts are found in O(1)."""
+
+    def __init__(self) -> None:
+        self.txs: Dict[TxID, Transaction] = dict()
+        self.spent: Dict[TxID, TxID] = dict()
+
+    def add(self, transaction: Transaction, txid: Optional[TxID] = None) -> None:
+        """Adds a transaction. The caller makes sure it doesn't conflict with a transaction of the mempool."""
+        if txid is None:
+            txid = transaction.get_txid()
+        self.txs[txid] = transaction
+        if transaction.input is not None:
+            self.spent[transaction.input] = txid
+
+    def remove(self, txid: TxID) -> Optional[Transaction]:
+        """Removes the transaction with the given txid, and returns it (or None if it isn't in the mempool)."""
+        transaction = self.txs.pop(txid, None)
+        if transaction is not None and transaction.input is not None:
+            del self.spent[transaction.input]
+        return transaction
+
+    def get(self, txid: TxID) -> Optional[Transaction]:
+        return self.txs.get(txid)
+
+    def spender(self, input_txid: Optional[TxID]) -> Optional[TxID]:
+        """Returns the txid of the transaction of the mempool that spends the given output, or None."""
+        return self.spent.get(input_txid)  # type: ignore
+
+    def take(self, count: int) -> List[Transaction]:
+        """Returns the first count transactions (the oldest ones), without removing them."""
+        return list(islice(self.txs.values(), count))
+
+    def clear(self) -> None:
+        self.txs.clear()
+        self.spent.clear()
+
+    def __contains__(self, txid: object) -> bool:
+        return txid in self.txs
+
+    def __iter__(self) -> Iterator[Transaction]:
+        return iter(self.txs.values())
+
+    def __len__(self) -> int:
+        return len(self.txs)
@@ -0,0 +1,56 @@
+import hashlib
+
+from .utils import TxID
+from typing import List, Sequence, Tuple
+
+# A proof that a txid is a leaf of a merkle tree: the hashes of the siblings on the path from the leaf to the root,
+# each with a flag telling if the sibling is on the left.
+MerkleProof = List[Tuple[bytes, bool]]
+
+# The root of the tree of a block without transactions.
+EMPTY_MERKLE_ROOT = hashlib.sha256(b"").digest()
+
+
+def _leaf_hash(txid: TxID) -> bytes:
+    return hashlib.sha256(b"\x00" + txid).digest()
+
+
+def _node_hash(left: bytes, right: bytes) -> bytes:
+    # leaves and inner nodes are hashed with different prefixes, so an inner node can't pass for a leaf
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _next_level(level: List[bytes]) -> List[bytes]:
+    # a node without a sibling is moved up unchanged
+    return [_node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+
+
+def merkle_root(txids: Sequence[TxID]) -> bytes:
+    """Returns the root of the merkle tree whose leaves are the given txids (in this order)."""
+    if not txids:
+        return EMPTY_MERKLE_ROOT
+    level = [_leaf_hash(txid) for txid in txids]
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_proof(txids: Sequence[TxID], index: int) -> MerkleProof:
+    """Returns the proof that txids[index] is a leaf of the merkle tree of txids. Its size is O(log(len(txids)))."""
+    level = [_leaf_hash(txid) for txid in txids]
+    proof: MerkleProof = list()
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append((level[sibling], sibling < index))
+        level = _next_level(level)
+        index //= 2
+    return proof
+
+
+def verify_inclusion(txid: TxID, proof: MerkleProof, root: bytes) -> bool:
+    """Returns True iff the proof shows that txid is a leaf of the merkle tree with the given root."""
+    current = _leaf_hash(txid)
+    for sibling, is_left in proof:
+        current = _node_hash(sibling, current) if is_left else _node_hash(current, sibling)
+    return current == root
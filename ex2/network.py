@@ -0,0 +1,66 @@
+from collections import Counter, deque
+
+from typing import Any, Deque, Iterable, Tuple
+
+
+class MessageBus:
+    """A queue of the notifications sent between nodes (notify_of_block, notify_of_transaction, ...).
+    Messages are delivered one at a time in the order they were sent, so a node never handles a message
+    while it is in the middle of handling another one, and propagation through a large network doesn't recurse.
+
+    With auto_run, the queue is run until it is empty as soon as a message is sent from outside of a delivery,
+    so the public methods of the nodes return only after all the resulting messages were handled.
+    Otherwise the messages stay queued until step() or run() is called."""
+
+    def __init__(self, auto_run: bool = True) -> None:
+        self.auto_run: bool = auto_run
+        self.queue: Deque[Tuple[Any, str, Tuple[Any, ...]]] = deque()
+        self.running: bool = False
+        # the number of delivered messages of each kind
+        self.delivered: Counter = Counter()
+
+    def broadcast(self, receivers: Iterable[Any], method: str, *args: Any) -> None:
+        """Sends the message receiver.method(*args) to each of the receivers."""
+        for receiver in list(receivers):
+            self.queue.append((receiver, method, args))
+        if self.auto_run and not self.running:
+            self.run()
+
+    def step(self) -> bool:
+        """Delivers the oldest pending message. Returns False if there was none."""
+        if not self.queue:
+            return False
+        receiver, method, args = self.queue.popleft()
+        self.delivered[method] += 1
+        getattr(receiver, method)(*args)
+        return True
+
+    def run(self) -> int:
+        """Delivers messages until the queue is empty (including the messages sent during delivery).
+        If a delivery raises, the other messages are still delivered and the first error is raised at the end,
+        so that no message is left in the queue for an unrelated later call.
+        Returns the number of delivered messages."""
+        count = 0
+        error = None
+        self.running = True
+        try:
+            while self.queue:
+                try:
+                    self.step()
+                except Exception as e:
+                    if error is None:
+                        error = e
+                count += 1
+        finally:
+            self.running = False
+        if error is not None:
+            raise error
+        return count
+
+    def pending(self) -> int:
+        """Returns the number of messages that were sent but not delivered yet."""
+        return len(self.queue)
+
+
+# The bus used by nodes unless they are given another one.
+DEFAULT_BUS = MessageBus()
@@ -3,27 +3,76 @@ import secrets
 from .utils import *
 from .block import Block
 from .transaction import Transaction
-from typing import Set, Optional, List
+from .sigcache import SIGNATURE_CACHE, SignatureCache
+from .inventory import InventoryFilter
+from .mempool import Mempool
+from .orphans import OrphanPool
+from .network import DEFAULT_BUS, MessageBus
+from .utxo import BlockUndo, UTXOOverlay, UTXOSet, UTXOStore, UTXOView
+from .blockstore import BlockStore, MemoryBlockStore, StoredChain
+from .encoding import valid_sizes
+from .snapshot import UTXOSnapshot
+from typing import Dict, Set, Optional, List, Sequence, Tuple
+
+# The maximal number of blocks sent in response to a single get_blocks_after request.
+MAX_BLOCKS_PER_REQUEST = 500
+# The number of most recent block hashes in a block locator before the spacing starts to double.
+LOCATOR_DENSE_HASHES = 10
+# The number of transaction ids remembered by the seen-inventory filters of a node.
+MAX_KNOWN_INVENTORY = 50000
+# The limits of the orphan pool, in blocks and in bytes of block data.
+MAX_ORPHAN_BLOCKS = 1000
+MAX_ORPHAN_BYTES = 4 * 1024 * 1024
+# The number of hashes of invalid blocks remembered by a node.
+MAX_INVALID_BLOCKS = 10000
+# Branches of at least this many blocks have their signatures verified in parallel, after the other checks.
+PARALLEL_BRANCH_BLOCKS = 16
 
 
 class Node:
-    def __init__(self) -> None:
+    def __init__(self, store: Optional[BlockStore] = None) -> None:
         """Creates a new node with an empty mempool and no connections to others.
         Blocks mined by this node will reward the miner with a single new coin,
-        created out of thin air and associated with the mining reward address"""
+        created out of thin air and associated with the mining reward address.
+        The blocks are kept in the given block store (in memory by default). If the store already holds a chain,
+        the node starts from it (see restore_chain)."""
 
         self.connections: Set[Node] = set()
-        self.mempool = list()
-        self.utxo = list()
-        self.blockchain: List[Block] = list()
+        # the queue that carries the notifications this node sends, replace it to run a network step by step
+        self.bus: MessageBus = DEFAULT_BUS
+        # the cache of verified signatures, shared by the nodes of the process unless it is replaced
+        self.signature_cache: SignatureCache = SIGNATURE_CACHE
+        self.mempool = Mempool()
+        self.utxo = UTXOSet()
+        # the blocks known to this node, on the current chain or on a side branch (blocks are never removed from it)
+        self.store: BlockStore = store if store is not None else MemoryBlockStore()
+        # the block the chain of this node starts from: the genesis, or the block of the utxo snapshot it started from.
+        # the heights below are counted from it
+        self.base_hash: BlockHash = GENESIS_BLOCK_PREV
+        self.base_height: int = -1
+        # the hashes of the blocks of the current chain by height, and the reverse index from a hash to its height
+        self.block_hashes: List[BlockHash] = list()
+        self.block_heights: Dict[BlockHash, int] = dict()
+        self.blockchain: Sequence[Block] = StoredChain(self.block_hashes, self.store)
+        # the blocks of the block tree (the current chain and the side branches that are not known to be invalid),
+        # indexed by hash, with their heights, the children of each block, and the tips of all the branches
+        self.tree_heights: Dict[BlockHash, int] = dict()
+        self.tree_children: Dict[BlockHash, Set[BlockHash]] = dict()
+        self.tips: Set[BlockHash] = set()
+        # blocks received before their previous block, connected to the tree once it arrives
+        self.orphans: OrphanPool = OrphanPool(MAX_ORPHAN_BLOCKS, MAX_ORPHAN_BYTES)
+        # hashes of blocks that failed validation or build on such a block, they are never fetched or validated again
+        self.invalid_blocks: InventoryFilter[None] = InventoryFilter(MAX_INVALID_BLOCKS)
         keys = gen_keys()
         self.private_key: PrivateKey = keys[0]
         self.public_key: PublicKey = keys[1]
-        self.spents_tx = dict()
-
-        self.reorg_chain = []
-        self.reorg_spents_tx = dict()
-        self.reorg_utxo = list()
+        # the undo record of every block of the current chain, used to roll the utxo set back in a reorg
+        self.undo: Dict[BlockHash, BlockUndo] = dict()
+        # txids of the transactions this node rejected since the last change of the tip (they are not requested
+        # again when announced, like the ones in the mempool), and of the accepted ones that peers may request.
+        self.rejected_txs: InventoryFilter[None] = InventoryFilter(MAX_KNOWN_INVENTORY)
+        self.relay_txs: InventoryFilter[Transaction] = InventoryFilter(MAX_KNOWN_INVENTORY)
+        self.restore_chain()
 
     def connect(self, other: 'Node') -> None:
         """connects this node to another node for block and transaction updates.
@@ -37,7 +86,7 @@ class Node:
             self.connections.add(other)
             if self not in other.get_connections():
                 other.connect(self)
-            other.notify_of_block(self.get_latest_hash(), self)
+            self.bus.broadcast([other], "notify_of_block", self.get_latest_hash(), self)
 
     def disconnect_from(self, other: 'Node') -> None:
         """Disconnects this node from the other node. If the two were not connected, then nothing happens"""
@@ -49,43 +98,18 @@ class Node:
         """Returns a set containing the connections of this node."""
         return self.connections
 
-    def valid_tx_for_reorg(self, transaction: Transaction) -> bool:
-        if not transaction.output or not transaction.signature:
-            return False
-        if transaction.input is None:
-            return True
-        input_transaction = None
-        for utxo in self.reorg_utxo:
-            if utxo.get_txid() == transaction.input:
-                input_transaction = utxo
-                break
-        if input_transaction is None:
-            return False
-        if not verify(transaction.output + transaction.input, transaction.signature, input_transaction.output):
-            return False
-        return True
-
     def is_tx_valid(self, transaction: Transaction) -> bool:
-        if not transaction.signature:
+        if not transaction.signature or not valid_sizes(transaction):
             return False
 
-        find_tx = False
-        utxos = self.get_utxo()
-        for i in range(len(utxos)):
-            if utxos[i].get_txid() == transaction.input:
-                find_tx = utxos[i]
-
-        if not find_tx:
+        find_tx = self.utxo.get(transaction.input)
+        if find_tx is None:
             return False
-        if not verify(transaction.output + transaction.input, transaction.signature, find_tx.output):
+        if not self.signature_cache.verify(transaction, find_tx.output):
             return False
 
-        if transaction.input not in [tx.get_txid() for tx in utxos]:
+        if self.mempool.spender(transaction.input) is not None:
             return False
-
-        for tx in self.mempool:
-            if tx.input == transaction.input:
-                return False
         if not transaction.input:
             return False
         return True
@@ -101,102 +125,414 @@ class Node:
         If the transaction is added successfully, then it is also sent to neighboring nodes.
         Transactions that create money (with no inputs) are not placed in the mempool, and not propagated. 
         """
+        txid = transaction.get_txid()
+        if txid in self.mempool or txid in self.rejected_txs:
+            # already seen: it isn't validated again, and a transaction of the mempool isn't recorded as rejected
+            return False
         if self.is_tx_valid(transaction):
-            self.mempool.append(transaction)
-            for node in self.connections:
-                node.add_transaction_to_mempool(transaction)
+            self.mempool.add(transaction, txid)
+            self.relay_txs.add(txid, transaction)
+            self.bus.broadcast(self.connections, "notify_of_transaction", txid, self)
             return True
+        self.rejected_txs.add(txid)
         return False
 
+    def notify_of_transaction(self, txid: TxID, sender: 'Node') -> None:
+        """This method is used by a node's connection to announce a transaction it accepted to its mempool.
+        The transaction is requested from the sender and added to the mempool, unless it is already in the mempool
+        or this node rejected it, in which case it isn't validated again."""
+        if txid in self.mempool or txid in self.rejected_txs:
+            return
+        transaction = sender.get_relayed_transaction(txid)
+        if transaction is None or transaction.get_txid() != txid:
+            return
+        self.add_transaction_to_mempool(transaction)
+
+    def get_relayed_transaction(self, txid: TxID) -> Optional[Transaction]:
+        """Returns a transaction this node recently accepted to its mempool given its txid, or None."""
+        return self.relay_txs.get(txid)
+
     def check_block_in_blockchain(self, block_hash: BlockHash):
-        if block_hash == GENESIS_BLOCK_PREV:
+        if block_hash == self.base_hash:
             return True
-        for block in self.blockchain:
-            if block.get_block_hash() == block_hash:
-                return True
-        return False
-
-    def find_the_known_block(self, block_hash: BlockHash, sender: 'Node'):
-        current_hash = block_hash
-        new_chain = list()
+        return block_hash in self.block_heights
+
+    def check_block_known(self, block_hash: BlockHash) -> bool:
+        """Returns True if the block is on the current chain or on a side branch known to this node."""
+        return block_hash == self.base_hash or block_hash in self.tree_heights
+
+    def add_to_tree(self, block_hash: BlockHash, block: Block) -> None:
+        """Stores a block in the block tree, as a child of its previous block."""
+        parent = block.get_prev_block_hash()
+        self.store.put(block_hash, block)
+        self.tree_heights[block_hash] = self.tree_heights.get(parent, -1) + 1
+        self.tree_children.setdefault(parent, set()).add(block_hash)
+        self.tips.discard(parent)
+        if not self.tree_children.get(block_hash):
+            self.tips.add(block_hash)
+
+    def remove_from_tree(self, block_hash: BlockHash) -> List[BlockHash]:
+        """Removes a block and all of its descendants from the block tree. Returns the hashes of the removed blocks."""
+        parent = self.store.get(block_hash).get_prev_block_hash()
+        self.tree_children[parent].discard(block_hash)
+        if not self.tree_children[parent]:
+            del self.tree_children[parent]
+            if parent in self.tree_heights:
+                self.tips.add(parent)
+        removed = list()
+        to_remove = [block_hash]
+        while to_remove:
+            current = to_remove.pop()
+            to_remove.extend(self.tree_children.pop(current, ()))
+            del self.tree_heights[current]
+            self.tips.discard(current)
+            removed.append(current)
+        return removed
+
+    def mark_invalid(self, block_hashes: List[BlockHash]) -> None:
+        """Records that the given blocks are invalid, along with their descendants in the block tree and in the
+        orphan pool (which are removed from there). Blocks of the current chain are never marked."""
+        to_mark = list(block_hashes)
+        while to_mark:
+            block_hash = to_mark.pop()
+            if block_hash in self.block_heights:
+                continue
+            self.invalid_blocks.add(block_hash)
+            if block_hash in self.tree_heights:
+                to_mark.extend(self.remove_from_tree(block_hash)[1:])
+            to_mark.extend(orphan_hash for orphan_hash, _ in self.orphans.pop_children(block_hash))
+
+    def connect_orphans(self, block_hashes: List[BlockHash]) -> List[BlockHash]:
+        """Moves the orphan blocks that descend from the given blocks of the tree into the tree.
+        Returns the hashes of the blocks that were connected."""
+        connected = list()
+        to_visit = list(block_hashes)
+        while to_visit:
+            for block_hash, block in self.orphans.pop_children(to_visit.pop()):
+                if self.valid_block_structure(block):
+                    self.add_to_tree(block_hash, block)
+                    connected.append(block_hash)
+                    to_visit.append(block_hash)
+                else:
+                    self.mark_invalid([block_hash])
+        return connected
+
+    def side_branch(self, tip_hash: BlockHash) -> Tuple[BlockHash, List[Block], List[BlockHash]]:
+        """Walks the block tree back from tip_hash to the current chain.
+        Returns the split point, and the blocks of the branch and their hashes (from the oldest to tip_hash)."""
+        blocks = list()
+        hashes = list()
+        current = tip_hash
+        while not self.check_block_in_blockchain(current):
+            block = self.store.get(current)
+            blocks.append(block)
+            hashes.append(current)
+            current = block.get_prev_block_hash()
+        blocks.reverse()
+        hashes.reverse()
+        return current, blocks, hashes
+
+    def get_tips(self) -> Set[BlockHash]:
+        """Returns the hashes of the tips of all the branches known to this node (including the current chain)."""
+        return self.tips
+
+    def get_block_locator(self) -> List[BlockHash]:
+        """
+        Returns hashes of blocks of the current chain, from the tip backwards: the most recent blocks one by one,
+        and then with an exponentially growing spacing. This lets a peer find the split point with our chain
+        using O(log(chain length)) hashes.
+        The highest tips of side branches come first, so that a peer extending one of them only sends the new blocks.
+        """
+        side_tips = [tip for tip in self.tips if tip not in self.block_heights]
+        side_tips.sort(key=self.tree_heights.__getitem__, reverse=True)
+        locator = side_tips[:LOCATOR_DENSE_HASHES]
+        height = len(self.block_hashes) - 1
+        step = 1
+        while height >= 0:
+            locator.append(self.block_hashes[height])
+            if len(locator) >= LOCATOR_DENSE_HASHES:
+                step *= 2
+            height -= step
+        if self.base_hash != GENESIS_BLOCK_PREV:
+            locator.append(self.base_hash)
+        return locator
+
+    def get_blocks_after(self, locator: List[BlockHash], stop_hash: BlockHash) -> Tuple[BlockHash, List[Block]]:
+        """
+        Answers a sync request of a peer. The first hash of the locator that is in the current chain (below stop_hash)
+        is the split point, and the blocks that follow it up to the block stop_hash are returned along with it,
+        at most MAX_BLOCKS_PER_REQUEST of them. If no hash of the locator is known, the split point is the genesis
+        (or the snapshot block this node started from).
+        If stop_hash isn't in the current chain, a ValueError is raised.
+        """
+        if stop_hash not in self.block_heights:
+            raise ValueError("the block doesnt exist")
+        stop_height = self.block_heights[stop_hash]
+        fork_height = -1
+        for known_hash in locator:
+            if self.block_heights.get(known_hash, stop_height + 1) <= stop_height:
+                fork_height = self.block_heights[known_hash]
+                break
+        fork_hash = self.block_hashes[fork_height] if fork_height >= 0 else self.base_hash
+        last_height = min(stop_height, fork_height + MAX_BLOCKS_PER_REQUEST)
+        return fork_hash, [self.get_block(self.block_hashes[height])
+                           for height in range(fork_height + 1, last_height + 1)]
 
-        while not self.check_block_in_blockchain(current_hash):
+    def fetch_chain(self, block_hash: BlockHash,
+                    sender: 'Node') -> Tuple[Optional[BlockHash], List[Block], List[BlockHash]]:
+        """
+        Downloads the blocks from a split point with our chain up to block_hash, using batched get_blocks_after
+        requests. Returns the split point, the blocks and their hashes.
+        If the sender fails, or answers with blocks that don't follow the previous ones, the blocks downloaded until
+        then are returned. If the split point is unknown, the first batch is parked in the orphan pool (its ancestors
+        may arrive later) and the split point returned is None, as it is for a reply with a block known to be invalid.
+        Such a reply is dropped, but block_hash isn't marked invalid: nothing shows that it descends from that block.
+        """
+        locator = self.get_block_locator()
+        fork_hash: Optional[BlockHash] = None
+        new_chain: List[Block] = list()
+        hashes: List[BlockHash] = list()
+        current_hash = None
+        while current_hash != block_hash:
             try:
-                new_block = sender.get_block(current_hash)
-                if not new_block.get_block_hash() == current_hash:
-                    raise ValueError("have the same block hash ")
-                new_chain.insert(0, new_block)
-                prev_block = new_block.get_prev_block_hash()
-                current_hash = prev_block
-            except:
-
-                return [], None
+                start_hash, blocks = sender.get_blocks_after(locator, block_hash)
+            except Exception:
+                break
+            if fork_hash is None:
+                fork_hash = current_hash = start_hash
+            if start_hash in self.invalid_blocks:
+                # the reply isn't checked to lead to block_hash, so only the reply is dropped
+                return None, [], []
+            if start_hash != current_hash or not blocks:
+                break
+            for block in blocks:
+                if block.get_prev_block_hash() != current_hash:
+                    break
+                current_hash = block.get_block_hash()
+                if current_hash in self.invalid_blocks:
+                    return None, [], []
+                new_chain.append(block)
+                hashes.append(current_hash)
+            else:
+                if self.check_block_known(fork_hash):
+                    locator = [current_hash]
+                    continue
+            break
+        if fork_hash is not None and not self.check_block_known(fork_hash):
+            for orphan_hash, orphan in zip(hashes, new_chain):
+                self.orphans.add(orphan_hash, orphan)
+            return None, [], []
+        return fork_hash, new_chain, hashes
 
-        return new_chain, current_hash
+    def find_the_known_block(self, block_hash: BlockHash, sender: 'Node'):
+        """Fetches the blocks of the sender's chain that lead to block_hash from a block this node knows.
+        Returns these blocks (from the oldest) and the known block they follow, or ([], None) if there are none."""
+        if self.check_block_known(block_hash):
+            return [], block_hash
+        if block_hash in self.invalid_blocks:
+            return [], None
+        # the announced block alone is enough to reject the descendants of an invalid block, or to connect
+        # a block that extends a known one, without asking for the branch
+        try:
+            tip = sender.get_block(block_hash)
+            if tip.get_block_hash() != block_hash:
+                raise ValueError("the block has a different hash")
+        except Exception:
+            return [], None
+        parent = tip.get_prev_block_hash()
+        if parent in self.invalid_blocks:
+            self.mark_invalid([block_hash])
+            return [], None
+        if self.check_block_known(parent):
+            return [tip], parent
+        current_hash, new_chain, hashes = self.fetch_chain(block_hash, sender)
+        if current_hash is None:
+            return [], None
+        # the locator may point below the actual split point, skip the blocks we already have
+        known = 0
+        while known < len(hashes) and hashes[known] in self.tree_heights:
+            current_hash = hashes[known]
+            known += 1
+        return new_chain[known:], current_hash
 
     def chain_until_block(self, block_hash):
-        if self.blockchain:
-            chain = []
-            last_hash = self.blockchain[-1].get_block_hash()
-            wanted_hash = block_hash
-            while not last_hash == GENESIS_BLOCK_PREV and not wanted_hash == last_hash:
-                block: Block = self.get_block(last_hash)
-                chain.append(block)
-                last_hash = block.get_prev_block_hash()
-            return chain
-        return []
-
-    def remove_block(self, block: Block):
-
-        to_removed_tx = [tx.get_txid() for tx in block.get_transactions()]
-        self.reorg_utxo = [tx for tx in self.reorg_utxo if
-                           tx.get_txid() not in to_removed_tx and tx.input not in to_removed_tx]
-        for tx in block.get_transactions():
-            if tx.input and self.reorg_spents_tx[tx.input]:
-                self.reorg_utxo.append(self.reorg_spents_tx[tx.input])
-        self.reorg_chain.remove(block)
-
-    def valid_block(self, block: Block) -> bool:
+        fork_height = self.block_heights.get(block_hash, -1)
+        return [self.store.get(block_hash) for block_hash in reversed(self.block_hashes[fork_height + 1:])]
+
+    def index_chain(self, fork_height: int, hashes: List[BlockHash]) -> None:
+        """Replaces the blocks of the current chain above fork_height by the blocks with the given hashes
+        (which must be in the store), and records the change in the store."""
+        self.store.set_chain(fork_height, hashes)
+        for block_hash in self.block_hashes[fork_height + 1:]:
+            del self.block_heights[block_hash]
+        del self.block_hashes[fork_height + 1:]
+        for block_hash in hashes:
+            self.block_heights[block_hash] = len(self.block_hashes)
+            self.block_hashes.append(block_hash)
+
+    def restore_chain(self) -> None:
+        """Rebuilds the current chain, its indexes and the utxo set from the chain recorded in the block store.
+        The blocks were validated before they were recorded, so they are only connected again. Nothing is done if
+        the recorded chain doesn't start from the base of this node (a chain started from a utxo snapshot is
+        restored when the snapshot is loaded)."""
+        hashes = self.store.get_chain()
+        if not hashes or self.store.get(hashes[0]).get_prev_block_hash() != self.base_hash:
+            return
+        for block_hash in hashes:
+            block = self.store.get(block_hash)
+            self.add_to_tree(block_hash, block)
+            self.undo[block_hash] = self.utxo.connect_block(block)
+            self.block_heights[block_hash] = len(self.block_hashes)
+            self.block_hashes.append(block_hash)
+
+    def remove_block(self, block_hash: BlockHash, utxo: UTXOStore):
+        utxo.disconnect_block(self.undo[block_hash])
+
+    @staticmethod
+    def valid_block_structure(block: Block) -> bool:
+        """The checks of a block that don't depend on the chain it extends: its size, its single money creation and
+        the sizes of the fields of its transactions (which must fit the encoding of the block store)."""
         if len(block.get_transactions()) > BLOCK_SIZE:
             return False
-        counter = 0
+        if not all(valid_sizes(tx) for tx in block.get_transactions()):
+            return False
+        return sum(1 for tx in block.get_transactions() if not tx.input) == 1
+
+    def block_inputs(self, block: Block, utxo: UTXOStore) -> Optional[List[Tuple[Transaction, PublicKey]]]:
+        """The checks of a block against the utxo set it extends, except for the signatures: every transaction
+        spends an unspent output, and no output is spent twice in the block.
+        Returns the transactions with the owner of the output they spend (whose signature must be verified),
+        or None if the block is invalid."""
+        if not self.valid_block_structure(block):
+            return None
+        spent = set()
+        inputs = list()
         for tx in block.get_transactions():
             if not tx.input:
-                counter += 1
                 continue
-            if not self.valid_tx_for_reorg(tx):
-                return False
-        return counter == 1
-
-    def add_chain_to_blockchain(self, new_chain):
-
-        for block in new_chain:
-            if not self.valid_block(block):
+            if not tx.output or not tx.signature or tx.input in spent:
+                return None
+            input_transaction = utxo.get(tx.input)
+            if input_transaction is None:
                 return None
-            self.reorg_chain.append(block)
-
-            self.reorg_utxo.extend(block.get_transactions())
-            new_tx = [transaction.input for transaction in block.get_transactions()]
-            spent_tx = [tx for tx in self.reorg_utxo if tx.get_txid() in new_tx]
-            if spent_tx:
-                self.reorg_spents_tx.update({tx.get_txid(): tx for tx in spent_tx})
-            self.reorg_utxo = [tx for tx in self.reorg_utxo if tx not in spent_tx]
-
-    def chain_reorgs(self, new_chain, current_chain):
-        cancels_txs = list()
-        for block in current_chain:
-            self.remove_block(block)
-            cancels_txs.extend(block.get_transactions())
-        self.add_chain_to_blockchain(new_chain)
-        if len(self.blockchain) < len(self.reorg_chain):
-            self.blockchain = self.reorg_chain
-            self.utxo = self.reorg_utxo
-            self.spents_tx = self.reorg_spents_tx
-            prev_mempool = self.mempool[:]
-            self.mempool = []
-            self.mempool = [tx for tx in prev_mempool if self.is_tx_valid(tx)]
-            for node in self.connections:
-                node.notify_of_block(self.blockchain[-1].get_block_hash(), self)
+            spent.add(tx.input)
+            inputs.append((tx, input_transaction.output))
+        return inputs
+
+    def valid_block(self, block: Block, utxo: UTXOStore) -> bool:
+        inputs = self.block_inputs(block, utxo)
+        if inputs is None:
+            return False
+        return all(self.signature_cache.verify(tx, owner) for tx, owner in inputs)
+
+    def add_chain_to_blockchain(self, new_chain, utxo: UTXOStore,
+                                new_hashes: Optional[List[BlockHash]] = None) -> List[BlockUndo]:
+        """Connects the blocks of new_chain to utxo until the first invalid block (or a block known to be invalid).
+        Returns the undo records of the blocks that were connected."""
+        if len(new_chain) >= PARALLEL_BRANCH_BLOCKS:
+            return self.add_long_chain_to_blockchain(new_chain, utxo, new_hashes)
+        undos = list()
+        for i, block in enumerate(new_chain):
+            if block.get_prev_block_hash() in self.invalid_blocks:
+                break
+            if new_hashes is not None and new_hashes[i] in self.invalid_blocks:
+                break
+            if not self.valid_block(block, utxo):
+                break
+            undos.append(utxo.connect_block(block))
+        return undos
+
+    def add_long_chain_to_blockchain(self, new_chain, utxo: UTXOStore,
+                                     new_hashes: Optional[List[BlockHash]] = None) -> List[BlockUndo]:
+        """Does the same as add_chain_to_blockchain, but the blocks are first connected with all the checks
+        except the signatures, and then the signatures of the whole branch are verified at once (in parallel).
+        The branch is cut before the first block with a bad signature, and the blocks after it are rolled back."""
+        undos = list()
+        to_verify = list()
+        for i, block in enumerate(new_chain):
+            if block.get_prev_block_hash() in self.invalid_blocks:
+                break
+            if new_hashes is not None and new_hashes[i] in self.invalid_blocks:
+                break
+            inputs = self.block_inputs(block, utxo)
+            if inputs is None:
+                break
+            for tx, owner in inputs:
+                txid = tx.get_txid()
+                if not self.signature_cache.contains(txid, owner):
+                    to_verify.append((i, txid, tx, owner))
+            undos.append(utxo.connect_block(block))
+
+        results = verify_many([tx.output + tx.input for _, _, tx, _ in to_verify],
+                              [tx.signature for _, _, tx, _ in to_verify],
+                              [owner for _, _, _, owner in to_verify])
+        self.signature_cache.misses += len(to_verify)
+        valid_blocks = len(undos)
+        for (i, txid, _, owner), is_valid in zip(to_verify, results):
+            if is_valid:
+                self.signature_cache.add(txid, owner)
+            else:
+                valid_blocks = min(valid_blocks, i)
+        for undo in reversed(undos[valid_blocks:]):
+            utxo.disconnect_block(undo)
+        return undos[:valid_blocks]
+
+    def chain_reorgs(self, new_chain, current_chain, new_hashes: Optional[List[BlockHash]] = None):
+        if new_hashes is None:
+            new_hashes = [block.get_block_hash() for block in new_chain]
+        fork_height = len(self.block_hashes) - len(current_chain) - 1
+        # the candidate branch is validated on an overlay, the active utxo set is only changed if it is adopted
+        utxo = UTXOOverlay(self.utxo)
+        for block_hash in reversed(self.block_hashes[fork_height + 1:]):
+            self.remove_block(block_hash, utxo)
+        undos = self.add_chain_to_blockchain(new_chain, utxo, new_hashes)
+        if len(undos) < len(new_chain):
+            # the first invalid block and the blocks built on it are forgotten, and never accepted again
+            self.mark_invalid(new_hashes[len(undos):])
+        if len(current_chain) < len(undos):
+            utxo.flush()
+            disconnected = [self.undo.pop(block_hash) for block_hash in self.block_hashes[fork_height + 1:]]
+            self.index_chain(fork_height, new_hashes[:len(undos)])
+            self.undo.update(zip(self.block_hashes[fork_height + 1:], undos))
+            self.rejected_txs.clear()
+            self.update_mempool(disconnected, new_chain[:len(undos)])
+            self.bus.broadcast(self.connections, "notify_of_block", self.get_latest_hash(), self)
+            # the rolled back transactions are announced after the new tip, so that peers see them on the new chain
+            cancels_txs = [tx for block in reversed(current_chain) for tx in block.get_transactions()]
+            self.resurrect_transactions(cancels_txs)
+
+    def update_mempool(self, disconnected: List[BlockUndo], connected: List[Block]) -> None:
+        """Removes from the mempool the transactions that the change of the chain made invalid: those that were
+        confirmed by the connected blocks or conflict with them, and those spending outputs created by the
+        disconnected blocks that are not in the utxo set anymore.
+        Only the outputs touched by these blocks are examined, the rest of the mempool is still valid."""
+        for block in connected:
+            for tx in block.get_transactions():
+                spender = self.mempool.spender(tx.input)
+                if spender is not None:
+                    self.mempool.remove(spender)
+        for undo in disconnected:
+            for txid in undo.created:
+                spender = self.mempool.spender(txid)
+                if spender is not None and txid not in self.utxo:
+                    self.mempool.remove(spender)
+
+    def resurrect_transactions(self, transactions: List[Transaction]) -> None:
+        """Puts back into the mempool the transactions of disconnected blocks that can still be executed:
+        their input is unspent on the new chain and no transaction of the mempool spends it.
+        Their signatures were verified when their block was connected, and the txid of the input commits to its
+        owner, so they are not verified again. They are announced to the peers, which only request the ones
+        they don't know already."""
+        resurrected = list()
+        for tx in transactions:
+            if tx.input is None or tx.input not in self.utxo or self.mempool.spender(tx.input) is not None:
+                continue
+            txid = tx.get_txid()
+            self.mempool.add(tx, txid)
+            self.relay_txs.add(txid, tx)
+            resurrected.append(txid)
+        for txid in resurrected:
+            self.bus.broadcast(self.connections, "notify_of_transaction", txid, self)
 
     def notify_of_block(self, block_hash: BlockHash, sender: 'Node') -> None:
         """This method is used by a node's connection to inform it that it has learned of a
@@ -219,13 +555,25 @@ class Node:
         """
 
         new_chain, known_block_hash = self.find_the_known_block(block_hash, sender)
-        if new_chain:
-            current_chain = self.chain_until_block(known_block_hash)
-            self.reorg_chain = self.blockchain[:]
-            self.reorg_utxo = self.utxo[:]
-            self.reorg_spents_tx = self.spents_tx.copy()
-            if len(current_chain) < len(new_chain):
-                self.chain_reorgs(new_chain, current_chain)
+        if not new_chain:
+            return
+        # the new blocks are kept in the block tree even if their branch isn't longer than the current chain,
+        # so they won't be downloaded again if the branch grows later
+        stored = list()
+        for i, block in enumerate(new_chain):
+            if not self.valid_block_structure(block):
+                self.mark_invalid([new_block.get_block_hash() for new_block in new_chain[i:]])
+                break
+            stored.append(block.get_block_hash())
+            self.add_to_tree(stored[-1], block)
+        if not stored:
+            return
+        stored.extend(self.connect_orphans(stored))
+        tip_hash = max(stored, key=self.tree_heights.__getitem__)
+        fork_hash, branch, branch_hashes = self.side_branch(tip_hash)
+        current_chain = self.chain_until_block(fork_hash)
+        if len(current_chain) < len(branch):
+            self.chain_reorgs(branch, current_chain, branch_hashes)
 
     def mine_block(self) -> BlockHash:
         """"
@@ -237,27 +585,18 @@ class Node:
         If a new block is created, all connections of this node are notified by calling their notify_of_block() method.
         The method returns the new block hash.
         """
-        index = len(self.mempool)
-        if len(self.mempool) > BLOCK_SIZE - 1:
-            index = BLOCK_SIZE - 1
-
         miner_money = Transaction(self.get_address(), None, secrets.token_bytes(48))
-        transactions_list = self.mempool[:index]
+        transactions_list = self.mempool.take(BLOCK_SIZE - 1)
         transactions_list.append(miner_money)
         new_block = Block(self.get_latest_hash(),transactions_list)
-        self.blockchain.append(new_block)
-
-        for node in self.connections:
-            node.notify_of_block(new_block.get_block_hash(), self)
-
-        self.mempool = self.mempool[index:]
-
-        self.utxo.extend(new_block.get_transactions())
-        new_tx = [transaction.input for transaction in new_block.get_transactions()]
-        spent_tx = [tx for tx in self.utxo if tx.get_txid() in new_tx]
-        self.spents_tx.update({tx.get_txid(): tx for tx in spent_tx})
-        self.utxo = [unspent_transaction for unspent_transaction in self.utxo if
-                       unspent_transaction.get_txid() not in new_tx]
+        new_block_hash = new_block.get_block_hash()
+        self.add_to_tree(new_block_hash, new_block)
+        self.index_chain(len(self.block_hashes) - 1, [new_block_hash])
+        self.undo[self.get_latest_hash()] = self.utxo.connect_block(new_block)
+        self.rejected_txs.clear()
+        self.update_mempool([], [new_block])
+
+        self.bus.broadcast(self.connections, "notify_of_block", new_block_hash, self)
         return self.get_latest_hash()
 
 
@@ -266,31 +605,53 @@ class Node:
         This function returns a block object given its hash.
         If the block doesnt exist, a ValueError is raised.
         """
-        for block in self.blockchain:
-            if block.get_block_hash() == block_hash:
-                return block
-        raise ValueError("the block doesnt exist")
+        if block_hash not in self.block_heights:
+            raise ValueError("the block doesnt exist")
+        return self.store.get(block_hash)
 
     def get_latest_hash(self) -> BlockHash:
         """
         This function returns the last block hash known to this node (the tip of its current chain).
         """
-        if len(self.blockchain) == 0:
-            return GENESIS_BLOCK_PREV
-        last_block = self.blockchain[len(self.blockchain) - 1]
-        return last_block.get_block_hash()
+        if len(self.block_hashes) == 0:
+            return self.base_hash
+        return self.block_hashes[-1]
 
     def get_mempool(self) -> List[Transaction]:
         """
         This function returns the list of transactions that didn't enter any block yet.
         """
-        return self.mempool
+        return list(self.mempool)
+
+    def export_utxo_snapshot(self) -> UTXOSnapshot:
+        """Returns a snapshot of the utxo set at the tip of the current chain."""
+        return UTXOSnapshot(self.get_latest_hash(), self.base_height + len(self.block_hashes),
+                            list(self.utxo.coins.values()))
+
+    def load_utxo_snapshot(self, snapshot: UTXOSnapshot) -> None:
+        """
+        Starts this node from a utxo snapshot instead of the genesis. The chain of the node then starts after the
+        snapshot block: only the blocks that follow it are downloaded and validated, and branches that split
+        below it are not adopted. Only a node without blocks can load a snapshot, otherwise a ValueError is raised.
+        If the block store holds a chain that follows the snapshot block, the node continues from it.
+        """
+        if self.tree_heights or self.orphans:
+            raise ValueError("only a node without blocks can load a snapshot")
+        self.utxo = UTXOSet()
+        for transaction in snapshot.transactions:
+            self.utxo.add(transaction)
+        self.base_hash = snapshot.block_hash
+        self.base_height = snapshot.height
+        # transactions rejected for spending unknown outputs may be valid now
+        self.rejected_txs.clear()
+        self.restore_chain()
 
     def get_utxo(self) -> List[Transaction]:
         """
         This function returns the list of unspent transactions.
+        The result is a read-only view of the utxo set of this node, and it follows later updates of the set.
         """
-        return self.utxo
+        return UTXOView(self.utxo)
 
         # ------------ Formerly wallet methods: -----------------------
 
@@ -305,16 +666,12 @@ class Node:
 
         The transaction is added to the mempool (and as a result is also published to neighboring nodes)
         """
-        mempool_inputs = [tx.input for tx in self.get_mempool()]
-        coins = list()
-        for tx in self.get_utxo():
-            if self.get_address() == tx.output and tx.get_txid() not in mempool_inputs:
-                coins.append(tx)
-        for coin in coins:
-            signature = sign(target+coin.get_txid(),self.private_key)
-            tx = Transaction(target, coin.get_txid(),signature)
-            self.add_transaction_to_mempool(tx)
-            return tx
+        for coin_txid in self.utxo.owned_by(self.get_address()):
+            if self.mempool.spender(coin_txid) is None:
+                signature = sign(target + coin_txid, self.private_key)
+                tx = Transaction(target, coin_txid, signature)
+                self.add_transaction_to_mempool(tx)
+                return tx
         return None
 
 
@@ -323,6 +680,7 @@ class Node:
         Clears the mempool of this node. All transactions waiting to be entered into the next block are gone.
         """
         self.mempool.clear()
+        self.rejected_txs.clear()
 
     def get_balance(self) -> int:
         """
@@ -330,8 +688,7 @@ class Node:
         Coins that the node owned and sent away will still be considered as part of the balance until the spending
         transaction is in the blockchain.
         """
-        balance = [tx for tx in self.utxo if tx.output == self.get_address()]
-        return len(balance)
+        return len(self.utxo.owned_by(self.get_address()))
 
     def get_address(self) -> PublicKey:
         """
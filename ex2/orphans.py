@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+from .utils import BlockHash
+from .block import Block
+from typing import Dict, List, Tuple
+
+
+def block_size(block: Block) -> int:
+    """The number of bytes of data held by a block (its previous hash and the fields of its transactions)."""
+    return len(block.get_prev_block_hash()) + sum(
+        len(tx.output) + len(tx.input or b"") + len(tx.signature or b"") for tx in block.get_transactions())
+
+
+class OrphanPool:
+    """Blocks whose previous block is unknown, waiting for it to arrive. They are indexed by the hash they point to,
+    so all the blocks waiting for a block are found at once. When the pool holds more than max_blocks blocks or
+    more than max_bytes bytes, the blocks that were added first are evicted."""
+
+    def __init__(self, max_blocks: int, max_bytes: int) -> None:
+        self.max_blocks: int = max_blocks
+        self.max_bytes: int = max_bytes
+        self.size: int = 0
+        self.blocks: 'OrderedDict[BlockHash, Tuple[Block, int]]' = OrderedDict()
+        self.by_parent: Dict[BlockHash, Dict[BlockHash, Block]] = dict()
+
+    def add(self, block_hash: BlockHash, block: Block) -> None:
+        if block_hash in self.blocks:
+            return
+        size = block_size(block)
+        self.blocks[block_hash] = (block, size)
+        self.by_parent.setdefault(block.get_prev_block_hash(), dict())[block_hash] = block
+        self.size += size
+        while len(self.blocks) > self.max_blocks or self.size > self.max_bytes:
+            self.remove(next(iter(self.blocks)))
+
+    def remove(self, block_hash: BlockHash) -> None:
+        block, size = self.blocks.pop(block_hash)
+        parent = block.get_prev_block_hash()
+        del self.by_parent[parent][block_hash]
+        if not self.by_parent[parent]:
+            del self.by_parent[parent]
+        self.size -= size
+
+    def pop_children(self, parent: BlockHash) -> List[Tuple[BlockHash, Block]]:
+        """Removes and returns the blocks that point to the given block."""
+        children = list(self.by_parent.get(parent, dict()).items())
+        for block_hash, _ in children:
+            self.remove(block_hash)
+        return children
+
+    def __contains__(self, block_hash: object) -> bool:
+        return block_hash in self.blocks
+
+    def __len__(self) -> int:
+        return len(self.blocks)
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+
+from .utils import PublicKey, TxID, verify
+from .transaction import Transaction
+from typing import Tuple
+
+
+class SignatureCache:
+    """A bounded cache of the transactions whose signature was already verified successfully.
+    Entries are keyed by (txid, owner of the spent output): the txid commits to the output, input and signature,
+    so a successful verification of that pair will always succeed again. Failed verifications are not cached."""
+
+    def __init__(self, max_size: int = 100000) -> None:
+        self.max_size: int = max_size
+        self.entries: 'OrderedDict[Tuple[TxID, PublicKey], None]' = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def verify(self, transaction: Transaction, owner: PublicKey) -> bool:
+        """Returns True iff the signature of the transaction was made by owner over the transaction's
+        output and input. The signature is only checked if this pair wasn't verified before."""
+        txid = transaction.get_txid()
+        if self.contains(txid, owner):
+            return True
+        self.misses += 1
+        if not verify(transaction.output + transaction.input, transaction.signature, owner):
+            return False
+        self.add(txid, owner)
+        return True
+
+    def contains(self, txid: TxID, owner: PublicKey) -> bool:
+        """Returns True if the signature of the transaction with this txid was already verified for owner."""
+        key = (txid, owner)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True
+        return False
+
+    def add(self, txid: TxID, owner: PublicKey) -> None:
+        """Records a successful verification that was made outside of the cache (see verify_many)."""
+        self.entries[(txid, owner)] = None
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Removes all the entries and resets the statistics of the cache"""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# The cache shared by all the nodes of this process.
+SIGNATURE_CACHE = SignatureCache()
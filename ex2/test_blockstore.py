@@ -0,0 +1,55 @@
+import os
+import secrets
+import tempfile
+
+from .block import Block
+from .blockstore import FileBlockStore, MemoryBlockStore
+from .node import Node
+from .transaction import Transaction
+from .utils import GENESIS_BLOCK_PREV, Signature, gen_keys
+
+
+def test_zero_filled_tail_is_truncated() -> None:
+    path = tempfile.mkdtemp()
+    node = Node(store=FileBlockStore(path))
+    for _ in range(8):
+        node.mine_block()
+    node.store.close()
+    segment = os.path.join(path, "blocks00000.dat")
+    size = os.path.getsize(segment)
+    with open(segment, "ab") as f:
+        f.write(bytes(50))
+    store = FileBlockStore(path)
+    assert len(store) == 8
+    assert os.path.getsize(segment) == size
+    store.close()
+
+
+def test_node_restarts_from_the_stored_chain() -> None:
+    path = tempfile.mkdtemp()
+    a = Node(store=FileBlockStore(path))
+    for _ in range(3):
+        a.mine_block()
+    b = Node()
+    for _ in range(5):
+        b.mine_block()
+    a.connect(b)
+    a.mine_block()
+    a.store.close()
+    restarted = Node(store=FileBlockStore(path))
+    assert restarted.get_latest_hash() == a.get_latest_hash()
+    assert len(restarted.blockchain) == 6
+    assert set(restarted.utxo.coins) == set(a.utxo.coins)
+    restarted.store.close()
+
+
+def test_blocks_that_dont_fit_the_encoding_are_invalid_for_every_store() -> None:
+    block = Block(GENESIS_BLOCK_PREV, [Transaction(gen_keys()[1], None, Signature(secrets.token_bytes(10)))])
+    sender = Node()
+    sender.get_block = lambda block_hash: block  # type: ignore
+    for store in (MemoryBlockStore(), FileBlockStore(tempfile.mkdtemp())):
+        node = Node(store=store)
+        node.notify_of_block(block.get_block_hash(), sender)
+        assert block.get_block_hash() in node.invalid_blocks
+        assert len(node.blockchain) == 0 and len(store) == 0
+        store.close()
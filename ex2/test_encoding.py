@@ -0,0 +1,82 @@
+import secrets
+
+import pytest
+from typing import List
+
+from .block import Block
+from .encoding import (BLOCK_HEADER_SIZE, FORMAT_VERSION, TX_SIZE, BlockView, decode_block, decode_transaction,
+                       encode_block, encode_transaction, iter_blocks)
+from .transaction import Transaction
+from .utils import GENESIS_BLOCK_PREV, PublicKey, Signature, TxID, gen_keys, sign
+
+
+def chain() -> List[Block]:
+    """A coinbase block, a block spending its coin and an empty block."""
+    private_key, public_key = gen_keys()
+    coinbase = Transaction(public_key, None, Signature(secrets.token_bytes(48)))
+    genesis = Block(GENESIS_BLOCK_PREV, [coinbase])
+    _, target = gen_keys()
+    payment = Transaction(target, coinbase.get_txid(), sign(target + coinbase.get_txid(), private_key))
+    second = Block(genesis.get_block_hash(), [payment, Transaction(target, None, Signature(secrets.token_bytes(48)))])
+    return [genesis, second, Block(second.get_block_hash(), [])]
+
+
+def same_transactions(a: Block, b: Block) -> bool:
+    return ([(tx.output, tx.input, tx.signature) for tx in a.get_transactions()]
+            == [(tx.output, tx.input, tx.signature) for tx in b.get_transactions()])
+
+
+def test_block_round_trip() -> None:
+    for block in chain():
+        decoded = decode_block(encode_block(block))
+        assert decoded.get_prev_block_hash() == block.get_prev_block_hash()
+        assert same_transactions(decoded, block)
+        assert decoded.get_block_hash() == block.get_block_hash()
+        assert len(encode_block(block)) == BLOCK_HEADER_SIZE + len(block.get_transactions()) * TX_SIZE
+
+
+def test_iter_blocks_over_concatenated_blocks() -> None:
+    blocks = chain()
+    views = list(iter_blocks(b"".join(encode_block(block) for block in blocks)))
+    assert len(views) == len(blocks)
+    for view, block in zip(views, blocks):
+        assert view.get_block_hash() == block.get_block_hash()
+        assert view.get_prev_block_hash() == block.get_prev_block_hash()
+        assert same_transactions(view.to_block(), block)
+        for index, transaction in enumerate(block.get_transactions()):
+            assert view.get_transaction(index).get_txid() == transaction.get_txid()
+
+
+def test_block_view_hash_matches_block_hash_at_an_offset() -> None:
+    blocks = chain()
+    data = encode_block(blocks[0]) + encode_block(blocks[1])
+    assert BlockView(data, len(encode_block(blocks[0]))).get_block_hash() == blocks[1].get_block_hash()
+
+
+def test_bad_flags_are_rejected() -> None:
+    block = chain()[1]
+    data = bytearray(encode_block(block))
+    data[BLOCK_HEADER_SIZE] |= 0x04
+    with pytest.raises(ValueError):
+        decode_block(data)
+    with pytest.raises(ValueError):
+        decode_transaction(data, BLOCK_HEADER_SIZE)
+
+
+def test_bad_versions_are_rejected() -> None:
+    data = bytearray(encode_block(chain()[0]))
+    for version in [0, FORMAT_VERSION + 1]:
+        data[0] = version
+        with pytest.raises(ValueError):
+            decode_block(data)
+        with pytest.raises(ValueError):
+            list(iter_blocks(data))
+
+
+def test_transactions_that_do_not_fit_the_encoding_are_rejected() -> None:
+    output = PublicKey(secrets.token_bytes(32))
+    for transaction in [Transaction(PublicKey(b"short"), None, Signature(secrets.token_bytes(48))),
+                        Transaction(output, TxID(b"short"), Signature(secrets.token_bytes(64))),
+                        Transaction(output, None, Signature(secrets.token_bytes(10)))]:
+        with pytest.raises(ValueError):
+            encode_transaction(transaction)
@@ -0,0 +1,49 @@
+import hashlib
+import secrets
+
+import pytest
+from typing import List
+
+from .block import Block
+from .merkle import EMPTY_MERKLE_ROOT, merkle_proof, merkle_root, verify_inclusion
+from .transaction import Transaction
+from .utils import GENESIS_BLOCK_PREV, PublicKey, Signature, TxID
+
+
+def txids(count: int) -> List[TxID]:
+    return [TxID(secrets.token_bytes(32)) for _ in range(count)]
+
+
+def test_proofs_of_every_leaf_for_odd_leaf_counts() -> None:
+    for count in [1, 3, 5, 6, 7, 9, 13]:
+        leaves = txids(count)
+        root = merkle_root(leaves)
+        for index, txid in enumerate(leaves):
+            assert verify_inclusion(txid, merkle_proof(leaves, index), root)
+
+
+def test_a_node_without_a_sibling_is_promoted_unchanged() -> None:
+    leaves = txids(3)
+    hashes = [hashlib.sha256(b"\x00" + txid).digest() for txid in leaves]
+    left = hashlib.sha256(b"\x01" + hashes[0] + hashes[1]).digest()
+    assert merkle_root(leaves) == hashlib.sha256(b"\x01" + left + hashes[2]).digest()
+    # the last leaf has no sibling on the first level, so its proof only holds the left subtree
+    assert merkle_proof(leaves, 2) == [(left, True)]
+
+
+def test_a_proof_does_not_hold_for_another_txid() -> None:
+    leaves = txids(7)
+    root = merkle_root(leaves)
+    for index in range(len(leaves)):
+        proof = merkle_proof(leaves, index)
+        assert not verify_inclusion(leaves[(index + 1) % len(leaves)], proof, root)
+        assert not verify_inclusion(TxID(secrets.token_bytes(32)), proof, root)
+
+
+def test_empty_block() -> None:
+    block = Block(GENESIS_BLOCK_PREV, [])
+    assert block.get_merkle_root() == EMPTY_MERKLE_ROOT
+    assert not verify_inclusion(TxID(secrets.token_bytes(32)), [], block.get_merkle_root())
+    with pytest.raises(ValueError):
+        block.get_inclusion_proof(Transaction(PublicKey(secrets.token_bytes(32)), None,
+                                              Signature(secrets.token_bytes(48))).get_txid())
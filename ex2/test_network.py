@@ -0,0 +1,29 @@
+from typing import List
+
+import pytest
+
+from .network import MessageBus
+
+
+class Receiver:
+    def __init__(self) -> None:
+        self.received: List[int] = list()
+
+    def notify(self, value: int) -> None:
+        self.received.append(value)
+
+
+class FailingReceiver:
+    def notify(self, value: int) -> None:
+        raise ValueError("the handler failed")
+
+
+def test_failed_delivery_leaves_no_pending_messages() -> None:
+    bus = MessageBus()
+    receiver = Receiver()
+    with pytest.raises(ValueError):
+        bus.broadcast([FailingReceiver(), receiver], "notify", 1)
+    assert bus.pending() == 0
+    assert receiver.received == [1]
+    bus.broadcast([receiver], "notify", 2)
+    assert receiver.received == [1, 2]
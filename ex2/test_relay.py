@@ -0,0 +1,23 @@
+from .node import Node
+
+
+def test_transaction_is_relayed_again_after_clear_mempool() -> None:
+    a, b = Node(), Node()
+    a.connect(b)
+    a.mine_block()
+    tx = a.create_transaction(b.get_address())
+    assert tx is not None and len(b.get_mempool()) == 1
+    a.clear_mempool()
+    b.clear_mempool()
+    assert a.add_transaction_to_mempool(tx)
+    assert [t.get_txid() for t in b.get_mempool()] == [tx.get_txid()]
+
+
+def test_resubmitting_a_mempool_transaction_does_not_reject_it() -> None:
+    a = Node()
+    a.mine_block()
+    tx = a.create_transaction(a.get_address())
+    assert tx is not None
+    assert not a.add_transaction_to_mempool(tx)
+    assert tx.get_txid() not in a.rejected_txs
+    assert a.get_mempool() == [tx]
@@ -0,0 +1,74 @@
+from .node import Node
+from .transaction import Transaction
+from .utils import sign
+from .utxo import UTXOSet
+
+
+def replayed_utxo(node: Node) -> UTXOSet:
+    utxo = UTXOSet()
+    for block in node.blockchain:
+        utxo.connect_block(block)
+    return utxo
+
+
+def test_reorg_forking_at_genesis() -> None:
+    a, b = Node(), Node()
+    a.mine_block()
+    b.mine_block()
+    tip = b.mine_block()
+    a.connect(b)
+    assert a.get_latest_hash() == tip
+    assert a.get_balance() == 0
+    assert len(a.get_utxo()) == 2
+    assert set(a.utxo.coins) == set(replayed_utxo(a).coins)
+
+
+def test_reorg_of_a_longer_fork() -> None:
+    a, b = Node(), Node()
+    for _ in range(3):
+        a.mine_block()
+    for _ in range(5):
+        b.mine_block()
+    a.connect(b)
+    assert a.get_latest_hash() == b.get_latest_hash()
+    assert set(a.utxo.coins) == set(replayed_utxo(a).coins) == set(b.utxo.coins)
+    assert len(a.undo) == len(a.blockchain)
+
+
+def test_rolled_back_payments_are_resurrected() -> None:
+    a, b = Node(), Node()
+    a.mine_block()
+    a.connect(b)
+    a.disconnect_from(b)
+    tx = a.create_transaction(b.get_address())
+    assert tx is not None
+    a.mine_block()
+    assert a.get_mempool() == []
+    b.mine_block()
+    b.mine_block()
+    a.connect(b)
+    assert a.get_latest_hash() == b.get_latest_hash()
+    # the payment's coin is still unspent on b's chain, so it goes back to the mempool and is relayed to b
+    assert [t.get_txid() for t in a.get_mempool()] == [tx.get_txid()]
+    assert [t.get_txid() for t in b.get_mempool()] == [tx.get_txid()]
+
+
+def test_mempool_is_cleaned_after_a_peer_block() -> None:
+    a, b = Node(), Node()
+    a.connect(b)
+    first = a.mine_block()
+    second = a.mine_block()
+    confirmed = a.create_transaction(b.get_address())
+    assert confirmed is not None and len(b.get_mempool()) == 1
+    a.disconnect_from(b)
+    # a's other coin is spent twice: in a's mempool, and in a block that b mines
+    coin = next(txid for txid in a.utxo.owned_by(a.get_address()) if txid != confirmed.input)
+    conflicting = a.create_transaction(a.get_address())
+    assert conflicting is not None and conflicting.input == coin
+    target = Node().get_address()
+    b.add_transaction_to_mempool(Transaction(target, coin, sign(target + coin, a.private_key)))
+    b.mine_block()
+    a.connect(b)
+    assert a.get_latest_hash() == b.get_latest_hash()
+    assert a.get_mempool() == [] and b.get_mempool() == []
+    assert first in a.block_heights and second in a.block_heights
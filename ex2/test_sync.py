@@ -0,0 +1,129 @@
+import secrets
+from typing import List, Tuple
+
+from . import node as node_module
+from .block import Block
+from .node import Node
+from .transaction import Transaction
+from .utils import BlockHash, GENESIS_BLOCK_PREV, Signature, gen_keys
+
+
+class FailingPeer:
+    """Answers the first get_blocks_after requests of a node, and then fails."""
+
+    def __init__(self, node: Node, answers: int) -> None:
+        self.node = node
+        self.answers = answers
+
+    def get_blocks_after(self, locator: List[BlockHash], stop_hash: BlockHash) -> Tuple[BlockHash, List[Block]]:
+        if self.answers == 0:
+            raise ValueError("the peer disconnected")
+        self.answers -= 1
+        return self.node.get_blocks_after(locator, stop_hash)
+
+    def get_block(self, block_hash: BlockHash) -> Block:
+        return self.node.get_block(block_hash)
+
+
+def test_blocks_downloaded_before_a_failure_are_kept(monkeypatch) -> None:
+    monkeypatch.setattr(node_module, "MAX_BLOCKS_PER_REQUEST", 2)
+    a, b = Node(), Node()
+    for _ in range(5):
+        b.mine_block()
+    a.notify_of_block(b.get_latest_hash(), FailingPeer(b, 1))
+    assert [block.get_block_hash() for block in a.blockchain] == b.block_hashes[:2]
+
+
+def test_batch_with_an_unknown_split_point_is_parked(monkeypatch) -> None:
+    a, b = Node(), Node()
+    first = b.mine_block()
+    b.mine_block()
+    tip = b.mine_block()
+    # b answers as if the chain started after its first block
+    monkeypatch.setattr(b, "get_blocks_after", lambda locator, stop_hash: (first, b.blockchain[1:]))
+    a.notify_of_block(tip, b)
+    assert len(a.orphans) == 2 and len(a.blockchain) == 0
+    # the missing block arrives later
+    monkeypatch.setattr(b, "get_blocks_after", lambda locator, stop_hash: (GENESIS_BLOCK_PREV, [b.get_block(first)]))
+    a.notify_of_block(first, b)
+    assert a.get_latest_hash() == tip
+
+
+class ChainPeer:
+    """Serves a fixed chain of blocks, and counts the blocks it sends."""
+
+    def __init__(self, blocks: List[Block]) -> None:
+        self.blocks = {block.get_block_hash(): block for block in blocks}
+        self.hashes = list(self.blocks)
+        self.sent = 0
+
+    def get_block(self, block_hash: BlockHash) -> Block:
+        self.sent += 1
+        return self.blocks[block_hash]
+
+    def get_blocks_after(self, locator: List[BlockHash], stop_hash: BlockHash) -> Tuple[BlockHash, List[Block]]:
+        start = next((self.hashes.index(known_hash) + 1 for known_hash in locator if known_hash in self.blocks), 0)
+        blocks = [self.blocks[block_hash] for block_hash in self.hashes[start:self.hashes.index(stop_hash) + 1]]
+        self.sent += len(blocks)
+        return (self.hashes[start - 1] if start else GENESIS_BLOCK_PREV), blocks
+
+
+def coinbase() -> Transaction:
+    return Transaction(gen_keys()[1], None, Signature(secrets.token_bytes(48)))
+
+
+def test_descendants_of_an_invalid_block_are_rejected_without_fetching_the_branch() -> None:
+    blocks = [Block(GENESIS_BLOCK_PREV, [coinbase()])]
+    # a block with two money creations is invalid
+    blocks.append(Block(blocks[-1].get_block_hash(), [coinbase(), coinbase()]))
+    for _ in range(3):
+        blocks.append(Block(blocks[-1].get_block_hash(), [coinbase()]))
+    peer = ChainPeer(blocks)
+    node = Node()
+    node.notify_of_block(blocks[1].get_block_hash(), peer)
+    assert len(node.blockchain) == 1 and blocks[1].get_block_hash() in node.invalid_blocks
+    peer.sent = 0
+    for block in blocks[2:]:
+        node.notify_of_block(block.get_block_hash(), peer)
+        assert block.get_block_hash() in node.invalid_blocks
+    assert peer.sent == 3
+
+
+def test_poisoned_reply_does_not_blacklist_the_announced_block() -> None:
+    bad = Block(GENESIS_BLOCK_PREV, [coinbase(), coinbase()])
+    victim = Node()
+    victim.notify_of_block(bad.get_block_hash(), ChainPeer([bad]))
+    assert bad.get_block_hash() in victim.invalid_blocks
+    honest = Node()
+    for _ in range(4):
+        honest.mine_block()
+    tip = honest.get_latest_hash()
+
+    class PoisoningPeer:
+        def get_block(self, block_hash: BlockHash) -> Block:
+            return honest.get_block(block_hash)
+
+        def get_blocks_after(self, locator: List[BlockHash], stop_hash: BlockHash) -> Tuple[BlockHash, List[Block]]:
+            return GENESIS_BLOCK_PREV, [bad]
+
+    victim.notify_of_block(tip, PoisoningPeer())
+    assert tip not in victim.invalid_blocks
+    victim.notify_of_block(tip, honest)
+    assert victim.get_latest_hash() == tip
+
+
+def test_a_stored_fork_that_overtakes_the_chain_is_adopted_by_fetching_only_the_new_block() -> None:
+    a = Node()
+    for _ in range(3):
+        a.mine_block()
+    fork = [Block(GENESIS_BLOCK_PREV, [coinbase()])]
+    for _ in range(3):
+        fork.append(Block(fork[-1].get_block_hash(), [coinbase()]))
+    # a fork as long as the chain is stored, but not adopted
+    a.notify_of_block(fork[2].get_block_hash(), ChainPeer(fork[:3]))
+    assert all(block.get_block_hash() in a.tree_heights for block in fork[:3])
+    assert len(a.blockchain) == 3 and fork[2].get_block_hash() != a.get_latest_hash()
+    peer = ChainPeer(fork)
+    a.notify_of_block(fork[3].get_block_hash(), peer)
+    assert peer.sent == 1
+    assert [block.get_block_hash() for block in a.blockchain] == peer.hashes
@@ -0,0 +1,175 @@
+from abc import ABC, abstractmethod
+from itertools import islice
+
+from .utils import PublicKey, TxID
+from .block import Block
+from .transaction import Transaction
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union, overload
+
+
+class BlockUndo:
+    """The changes made to the utxo set by connecting a block: the outputs it created and the outputs it spent.
+    It is all that is needed to disconnect the block again."""
+
+    def __init__(self) -> None:
+        self.created: List[TxID] = list()
+        self.spent: List[Tuple[TxID, Transaction]] = list()
+
+
+class UTXOStore(ABC):
+    """The operations shared by the utxo set of a node and by the overlays used to validate a candidate branch."""
+
+    @abstractmethod
+    def add(self, transaction: Transaction, txid: Optional[TxID] = None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove(self, txid: TxID) -> Optional[Transaction]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, txid: Optional[TxID]) -> Optional[Transaction]:
+        raise NotImplementedError
+
+    def connect_block(self, block: Block) -> BlockUndo:
+        """Adds the outputs created by the block and removes the outputs it spends.
+        Returns the undo record that disconnect_block uses to roll the block back."""
+        undo = BlockUndo()
+        for tx in block.get_transactions():
+            txid = tx.get_txid()
+            self.add(tx, txid)
+            undo.created.append(txid)
+        for tx in block.get_transactions():
+            if tx.input is not None:
+                spent = self.remove(tx.input)
+                if spent is not None:
+                    undo.spent.append((tx.input, spent))
+        return undo
+
+    def disconnect_block(self, undo: BlockUndo) -> None:
+        """Rolls back a block given the undo record returned when it was connected."""
+        for txid, tx in undo.spent:
+            self.add(tx, txid)
+        for txid in undo.created:
+            self.remove(txid)
+
+
+class UTXOSet(UTXOStore):
+    """The set of unspent transaction outputs, indexed by TxID and by the public key that owns the output."""
+
+    def __init__(self) -> None:
+        self.coins: Dict[TxID, Transaction] = dict()
+        self.owners: Dict[PublicKey, Dict[TxID, Transaction]] = dict()
+
+    def add(self, transaction: Transaction, txid: Optional[TxID] = None) -> None:
+        """Adds an unspent output. The txid can be given if it was already computed by the caller."""
+        if txid is None:
+            txid = transaction.get_txid()
+        self.coins[txid] = transaction
+        self.owners.setdefault(transaction.output, dict())[txid] = transaction
+
+    def remove(self, txid: TxID) -> Optional[Transaction]:
+        """Removes the output with the given txid, and returns it (or None if it is not unspent)."""
+        transaction = self.coins.pop(txid, None)
+        if transaction is not None:
+            owned = self.owners[transaction.output]
+            del owned[txid]
+            if not owned:
+                del self.owners[transaction.output]
+        return transaction
+
+    def get(self, txid: Optional[TxID]) -> Optional[Transaction]:
+        """Returns the unspent output with the given txid, or None if there isn't one."""
+        return self.coins.get(txid)  # type: ignore
+
+    def owned_by(self, owner: PublicKey) -> Dict[TxID, Transaction]:
+        """Returns the unspent outputs of the given public key, indexed by their txid. Do not modify the result."""
+        return self.owners.get(owner, dict())
+
+    def __contains__(self, txid: object) -> bool:
+        return txid in self.coins
+
+    def __len__(self) -> int:
+        return len(self.coins)
+
+
+class UTXOOverlay(UTXOStore):
+    """Changes to a utxo set that are recorded on the side, without modifying the set itself.
+    It is used to roll back and roll forward a candidate branch: the changes are written to the
+    underlying set by flush() if the branch is adopted, and are simply dropped otherwise."""
+
+    def __init__(self, base: UTXOSet) -> None:
+        self.base: UTXOSet = base
+        self.added: Dict[TxID, Transaction] = dict()
+        self.removed: Set[TxID] = set()
+
+    def add(self, transaction: Transaction, txid: Optional[TxID] = None) -> None:
+        if txid is None:
+            txid = transaction.get_txid()
+        self.added[txid] = transaction
+        self.removed.discard(txid)
+
+    def remove(self, txid: TxID) -> Optional[Transaction]:
+        transaction = self.get(txid)
+        if transaction is not None:
+            self.added.pop(txid, None)
+            if txid in self.base.coins:
+                self.removed.add(txid)
+        return transaction
+
+    def get(self, txid: Optional[TxID]) -> Optional[Transaction]:
+        if txid in self.removed:
+            return None
+        if txid in self.added:
+            return self.added[txid]  # type: ignore
+        return self.base.get(txid)
+
+    def flush(self) -> None:
+        """Writes the recorded changes to the underlying utxo set."""
+        for txid in self.removed:
+            self.base.remove(txid)
+        for txid, transaction in self.added.items():
+            self.base.add(transaction, txid)
+        self.added = dict()
+        self.removed = set()
+
+
+class UTXOView(Sequence[Transaction]):
+    """A read-only list-like view of the transactions of a UTXOSet, that doesn't copy them."""
+
+    def __init__(self, utxo: UTXOSet) -> None:
+        self.utxo = utxo
+
+    def __len__(self) -> int:
+        return len(self.utxo.coins)
+
+    def __iter__(self) -> Iterator[Transaction]:
+        return iter(self.utxo.coins.values())
+
+    def __contains__(self, transaction: object) -> bool:
+        if not isinstance(transaction, Transaction):
+            return False
+        return self.utxo.coins.get(transaction.get_txid()) is transaction
+
+    @overload
+    def __getitem__(self, index: int) -> Transaction: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[Transaction]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Transaction, Sequence[Transaction]]:
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("utxo index out of range")
+        return next(islice(self.utxo.coins.values(), index, None))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (list, tuple, UTXOView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))